@@ -0,0 +1,60 @@
+# standalone usage agent, runs on each box and pushes samples to the bot over one persistent socket
+# python agent.py --name nas-1 --connect tcp://bot-host:9300 --token <AGENT_TOKEN>
+import argparse
+import asyncio
+import os
+import socket
+
+from dotenv import load_dotenv
+
+from utils.agentproto import encode_hello, encode_sample, parse_address
+from utils.hostfacts import HostFacts, PUBLIC_IP_URL
+from utils.sampler import SystemSampler
+
+load_dotenv()
+
+async def open_connection(address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+async def run_agent(name: str, address: str, token: str, interval: float, public_ip_url: str):
+    sampler = SystemSampler(interval=interval)
+    facts = HostFacts(public_ip_url=public_ip_url)
+    backoff = 1
+    while True:
+        writer = None
+        try:
+            reader, writer = await open_connection(address)
+            writer.write(encode_hello(name, token, await facts.get()))
+            await writer.drain()
+            print(f"agent {name} connected to {address}")
+            backoff = 1
+            while True:
+                writer.write(encode_sample(await sampler.refresh()))
+                await writer.drain()
+                await asyncio.sleep(interval)
+        except (OSError, ConnectionError) as e:
+            print(f"agent {name} lost {address} ({e}), retrying in {backoff}s")
+        finally:
+            if writer:
+                writer.close()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="push this machine's usage to the bot")
+    parser.add_argument("--name", default=socket.gethostname(), help="host name shown in /usage host")
+    parser.add_argument("--connect", default=os.getenv("AGENT_CONNECT", "tcp://127.0.0.1:9300"), help="tcp://host:port or unix:///path")
+    parser.add_argument("--token", default=os.getenv("AGENT_TOKEN", ""))
+    parser.add_argument("--interval", type=float, default=30)
+    parser.add_argument("--public-ip-url", default=PUBLIC_IP_URL, help="empty to skip the public ip lookup")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_agent(args.name, args.connect, args.token, args.interval, args.public_ip_url))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# time the event loop spends logging a burst of slash cmd completions, old FileHandler vs queued json log
+# writes into a temp dir, run from repo root: python benchmarks/action_log.py [completions]
+import asyncio
+import datetime
+import logging
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.actionlog import setup_action_log
+
+COMPLETIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+SLOW_DISK = 0.0005 # per write stall for the sd card / busy disk run
+
+def fake_completion(i):
+    user = SimpleNamespace(id=100000 + i % 50, name=f"user{i % 50}")
+    channel = SimpleNamespace(id=200000 + i % 7, name=f"chan{i % 7}")
+    interaction = SimpleNamespace(user=user, channel=channel, guild_id=1, created_at=datetime.datetime.now(datetime.timezone.utc))
+    return interaction, SimpleNamespace(name="ping", qualified_name="ping")
+
+async def old_handler(logger, interaction, command):
+    user = interaction.user
+    channel = interaction.channel
+    logger.info(f"[SLASH] {user} (ID: {user.id}) ran /{command.name} in #{getattr(channel, 'name', 'DM')} (ID: {getattr(channel, 'id', 'DM')})")
+
+async def new_handler(logger, interaction, command):
+    user = interaction.user
+    channel = interaction.channel
+    latency = (datetime.datetime.now(datetime.timezone.utc) - interaction.created_at).total_seconds()
+    logger.info("[SLASH] %s ran /%s", user, command.qualified_name, extra={"fields": {
+        "kind": "slash",
+        "command": command.qualified_name,
+        "user_id": user.id,
+        "channel_id": getattr(channel, "id", None),
+        "guild_id": interaction.guild_id,
+        "latency_ms": round(latency * 1000, 1)
+    }})
+
+async def burst(handler, logger):
+    events = [fake_completion(i) for i in range(COMPLETIONS)]
+    lags = []
+
+    async def ticker():
+        # how late a 1ms timer fires while the burst runs = what every other handler feels
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    costs = []
+    start = time.perf_counter()
+    for i, (interaction, command) in enumerate(events):
+        t = time.perf_counter()
+        await handler(logger, interaction, command)
+        costs.append(time.perf_counter() - t)
+        if i % 50 == 0:
+            await asyncio.sleep(0) # completions arrive as separate events, let the ticker in
+    total = time.perf_counter() - start
+    tick.cancel()
+    return total, costs, lags
+
+def report(name, total, costs, lags, drained):
+    costs.sort()
+    print(f"{name:16s} on loop {total * 1000:7.1f} ms  per event p50 {statistics.median(costs) * 1e6:6.1f} us"
+          f"  p99 {costs[int(len(costs) * 0.99)] * 1e6:6.1f} us  max loop lag {max(lags, default=0) * 1000:5.2f} ms  on disk after {drained * 1000:7.1f} ms")
+
+def slow(handler, stall):
+    # every flush blocks for a bit like a busy disk would
+    if stall:
+        flush = handler.flush
+        def slow_flush():
+            time.sleep(stall)
+            flush()
+        handler.flush = slow_flush
+    return handler
+
+async def run(stall):
+    print(f"disk stall per write: {stall * 1000:.1f} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        old_logger = logging.getLogger(f"bench.old.{stall}")
+        old_logger.propagate = False
+        old_logger.setLevel(logging.INFO)
+        file_handler = logging.FileHandler(os.path.join(tmp, "old.log"))
+        file_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s', '%Y-%m-%d %H:%M:%S'))
+        old_logger.addHandler(slow(file_handler, stall))
+        start = time.perf_counter()
+        total, costs, lags = await burst(old_handler, old_logger)
+        file_handler.close()
+        report("FileHandler", total, costs, lags, time.perf_counter() - start)
+
+        new_logger = logging.getLogger(f"bench.new.{stall}")
+        new_logger.propagate = False
+        listener = setup_action_log(os.path.join(tmp, "actions.log"), logger=new_logger, max_bytes=256 * 1024)
+        slow(listener.handlers[0], stall)
+        start = time.perf_counter()
+        total, costs, lags = await burst(new_handler, new_logger)
+        listener.stop()
+        report("queued json log", total, costs, lags, time.perf_counter() - start)
+
+        rotated = sorted(p.name for p in pathlib.Path(tmp).glob("actions.log.*"))
+        print(f"{COMPLETIONS} completions, json log rotated into {len(rotated)} gzipped files at 256 KiB (kept 7): {rotated[:3]}")
+        print(pathlib.Path(tmp, "actions.log").read_text().splitlines()[-1])
+        print()
+
+async def main():
+    await run(0)
+    await run(SLOW_DISK)
+
+if __name__ == "__main__":
+    asyncio.run(main())
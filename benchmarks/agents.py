@@ -0,0 +1,51 @@
+# spins up the bot-side agent server plus several agent.py processes, all on localhost
+# run from repo root: python benchmarks/agents.py [agents] [seconds]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.agentserver import AgentServer
+
+AGENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+INTERVAL = 0.25
+
+async def spawn(name, address, token="bench"):
+    return await asyncio.create_subprocess_exec(
+        sys.executable, str(ROOT / "agent.py"), "--name", name, "--connect", address,
+        "--token", token, "--interval", str(INTERVAL), "--public-ip-url", "",
+        cwd=str(ROOT), stdout=asyncio.subprocess.DEVNULL
+    )
+
+async def main():
+    tcp = AgentServer("tcp://127.0.0.1:0", token="bench")
+    server = await tcp.start()
+    tcp_address = "tcp://127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+    unix_address = "unix://" + os.path.join(tempfile.mkdtemp(), "agent.sock")
+    unix = AgentServer(unix_address, token="bench")
+    await unix.start()
+
+    procs = [await spawn(f"tcp-{i}", tcp_address) for i in range(AGENTS)]
+    procs.append(await spawn("unix-0", unix_address))
+    procs.append(await spawn("intruder", tcp_address, token="wrong")) # should never show up
+    await asyncio.sleep(SECONDS)
+    for proc in procs:
+        proc.terminate()
+        await proc.wait()
+
+    for server in (tcp, unix):
+        print(f"{server.address}: {len(server.hosts)} hosts, {server.frames} frames, "
+              f"{server.bytes / max(server.frames, 1):.0f} bytes per frame")
+        for name, host in sorted(server.hosts.items()):
+            stats = host.latest
+            print(f"  {name:<8} cpu {stats['cpu_percent']:5.1f}%  mem {stats['memory'].percent:5.1f}%  "
+                  f"{len(stats['per_core'])} cores  {host.trends.last_ts is not None and 'trends ok'}")
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+# counts discord rest calls per mention, with and without the old channel.history scan for "is thinking" msgs
+# discord's http layer is faked, the llm is a local stub. run from repo root: python benchmarks/chat_rest_calls.py [mentions]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from chat_session import start_stub
+
+MENTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+BOT_ID = 1000
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+class FakeHTTP:
+    def __init__(self):
+        self.calls = Counter()
+
+class FakeTyping:
+    def __init__(self, http):
+        self.http = http
+
+    async def __aenter__(self):
+        self.http.calls["POST typing"] += 1
+
+    async def __aexit__(self, *exc):
+        pass
+
+class FakeChannel:
+    def __init__(self, http):
+        self.http = http
+        self.id = 42
+        self.next_id = 1
+
+    def typing(self):
+        return FakeTyping(self.http)
+
+    async def send(self, content):
+        self.http.calls["POST message"] += 1
+        self.next_id += 1
+        return FakeMessage(self.http, self, self.next_id, FakeUser(BOT_ID), content)
+
+    async def history(self, limit):
+        self.http.calls["GET messages"] += 1
+        for _ in ():
+            yield
+
+class FakeMessage:
+    def __init__(self, http, channel, message_id, author, content):
+        self.http = http
+        self.channel = channel
+        self.id = message_id
+        self.author = author
+        self.content = content
+        self.guild = None
+
+    async def reply(self, content):
+        return await self.channel.send(content)
+
+    async def edit(self, content):
+        self.http.calls["PATCH message"] += 1
+
+async def old_cleanup(chat, message):
+    # what handle_mention used to do after every reply, the bot never posts those msgs so it never found any
+    thinking_messages = [msg async for msg in message.channel.history(limit=5)
+                         if msg.author == chat.bot.user and "is thinking" in msg.content]
+    for thinking_msg in thinking_messages:
+        await thinking_msg.delete()
+
+async def run(chat, cleanup):
+    http = FakeHTTP()
+    channel = FakeChannel(http)
+    for i in range(MENTIONS):
+        current = FakeMessage(http, channel, i, FakeUser(i), f"<@{BOT_ID}> question number {i}")
+        await chat.handle_mention(current)
+        if cleanup is not None:
+            await cleanup(chat, current)
+    return http.calls
+
+async def main():
+    runner, url = await start_stub()
+    os.environ["AI_URL"] = url
+    os.environ.setdefault("AI_KEY", "bench")
+    os.environ["AI_STREAM"] = "false"
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    # 100 mentions in one channel would mostly be throttled, this measures the reply path not the limits
+    os.environ.update({"CHAT_LIMIT_USER": "0", "CHAT_LIMIT_CHANNEL": "0", "CHAT_LIMIT_GUILD": "0"})
+    from commands.chat import Chat
+
+    bot = type("Bot", (), {"user": FakeUser(BOT_ID)})()
+    chat = Chat(bot)
+    await chat.start()
+
+    before = await run(chat, old_cleanup)
+    after = await run(chat, None)
+
+    await chat.close()
+    await runner.cleanup()
+
+    print(f"{MENTIONS} mentions")
+    for name, calls in (("history scan", before), ("no scan", after)):
+        total = sum(calls.values())
+        detail = ", ".join(f"{k} {v}" for k, v in sorted(calls.items()))
+        print(f"{name:<13} {total / MENTIONS:.2f} rest calls per mention ({detail})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
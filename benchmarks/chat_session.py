@@ -0,0 +1,73 @@
+# compares a fresh aiohttp session per mention vs the shared pooled one in Chat
+# run from repo root: python benchmarks/chat_session.py [requests]
+import asyncio
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+async def completions(request):
+    await request.json()
+    return web.json_response({"choices": [{"message": {"role": "assistant", "content": "hey there"}}]})
+
+async def start_stub():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def report(name, samples):
+    print(f"{name:<16} p50 {percentile(samples, 50)*1000:7.2f}ms  p99 {percentile(samples, 99)*1000:7.2f}ms  mean {statistics.mean(samples)*1000:7.2f}ms")
+
+async def fresh_session_call(url):
+    # old behaviour, new session (and connection) every call
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={"messages": []}) as response:
+            return await response.json()
+
+async def main():
+    runner, url = await start_stub()
+    os.environ["AI_URL"] = url
+    os.environ.setdefault("AI_KEY", "bench")
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    from commands.chat import Chat
+
+    before = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        await fresh_session_call(url)
+        before.append(time.perf_counter() - start)
+
+    chat = Chat(bot=None)
+    await chat.start()
+    after = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        await chat.call_groq_api("bench", "hey")
+        after.append(time.perf_counter() - start)
+    await chat.close()
+
+    print(f"{REQUESTS} requests against {url}")
+    report("session per call", before)
+    report("shared session", after)
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
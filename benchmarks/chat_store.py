@@ -0,0 +1,53 @@
+# startup time and per-message write cost for the sqlite chat store
+# run from repo root: python benchmarks/chat_store.py [users] [msgs_per_user]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.storage import ChatStore
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+MSGS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+async def main():
+    path = os.path.join(tempfile.mkdtemp(), "chat.db")
+
+    store = ChatStore(path, keep=MSGS, flush_interval=0.5)
+    await store.open()
+    start = time.perf_counter()
+    for user in range(USERS):
+        for i in range(MSGS):
+            store.add_message(str(user), {"role": "user", "content": f"message {i} from {user}"})
+    queued = time.perf_counter() - start
+    start = time.perf_counter()
+    await store.flush()
+    flushed = time.perf_counter() - start
+    for channel_id in range(50):
+        store.set_channel_disabled(channel_id, True)
+    await store.close()
+    total = USERS * MSGS
+
+    print(f"{USERS} users x {MSGS} msgs")
+    print(f"queue on loop     {queued / total * 1e6:8.2f}us per message")
+    print(f"batched flush     {flushed:8.3f}s total, {flushed / total * 1e6:8.2f}us per message (off loop)")
+
+    start = time.perf_counter()
+    store = ChatStore(path, keep=MSGS)
+    channels = await store.open()
+    startup = time.perf_counter() - start
+    print(f"startup           {startup*1000:8.2f}ms ({len(channels)} disabled channels, no history read)")
+
+    start = time.perf_counter()
+    for user in range(0, USERS, max(1, USERS // 1000)):
+        await store.load_history(str(user))
+    loads = len(range(0, USERS, max(1, USERS // 1000)))
+    print(f"lazy user load    {(time.perf_counter() - start) / loads * 1000:8.3f}ms per user")
+    await store.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+# time-to-first-visible-token, streamed replies vs waiting for the full completion
+# uses a local fake sse server, run from repo root: python benchmarks/chat_stream.py [tokens] [token_delay_ms]
+import asyncio
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+TOKENS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+TOKEN_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 25) / 1000
+
+async def completions(request):
+    body = await request.json()
+    words = [f"word{i} " for i in range(TOKENS)]
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * TOKENS)
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "".join(words)}}]})
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for word in words:
+        await asyncio.sleep(TOKEN_DELAY)
+        chunk = {"choices": [{"delta": {"content": word}}]}
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await response.write(b"data: [DONE]\n\n")
+    return response
+
+async def start_stub():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+class FakeSent:
+    def __init__(self):
+        self.edits = 0
+
+    async def edit(self, content):
+        self.edits += 1
+
+class FakeMessage:
+    def __init__(self):
+        self.author = type("Author", (), {"id": 1})()
+        self.first_reply_at = None
+        self.sent = FakeSent()
+
+    async def reply(self, content):
+        if self.first_reply_at is None:
+            self.first_reply_at = time.perf_counter()
+        return self.sent
+
+async def main():
+    runner, url = await start_stub()
+    os.environ["AI_URL"] = url
+    os.environ.setdefault("AI_KEY", "bench")
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    from commands import chat as chat_module
+
+    chat = chat_module.Chat(bot=None)
+    await chat.start()
+
+    message = FakeMessage()
+    start = time.perf_counter()
+    await message.reply(await chat.call_groq_api("1", "hey"))
+    blocking_first = message.first_reply_at - start
+
+    message = FakeMessage()
+    start = time.perf_counter()
+    await chat.stream_reply(message, "hey")
+    streamed_first = message.first_reply_at - start
+    streamed_total = time.perf_counter() - start
+
+    await chat.close()
+    await runner.cleanup()
+
+    print(f"{TOKENS} tokens, {TOKEN_DELAY*1000:.0f}ms apart, edit interval {chat_module.STREAM_EDIT_INTERVAL}s")
+    print(f"non-streamed  first visible {blocking_first*1000:8.1f}ms")
+    print(f"streamed      first visible {streamed_first*1000:8.1f}ms  done {streamed_total*1000:8.1f}ms  edits {message.sent.edits}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+# prompt build time for long histories, token packing vs the old fixed [-5:] slice
+# run from repo root: python benchmarks/context_build.py [history_len] [rounds]
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.context import ContextBuilder, estimate_tokens
+
+HISTORY = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+def make_history(n):
+    rng = random.Random(1)
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "word " * rng.choice((3, 20, 120, 600))}
+        for i in range(n)
+    ]
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func()
+    return (time.perf_counter() - start) / ROUNDS, result
+
+def main():
+    history = make_history(HISTORY)
+    builder = ContextBuilder("you are Kyra " * 40, context_tokens=4096, max_tokens=500)
+
+    old, old_msgs = timed(lambda: [builder.system, *history[-5:]])
+
+    new, packed = timed(lambda: builder.build(history))
+
+    old_tokens = sum(estimate_tokens(m["content"]) for m in old_msgs)
+    new_tokens = sum(estimate_tokens(m["content"]) for m in packed)
+    print(f"{HISTORY} msgs of history, {ROUNDS} rounds")
+    print(f"fixed [-5:] slice  {old*1e6:8.2f}us  {len(old_msgs) - 1:3d} msgs  ~{old_tokens} tokens (unbounded)")
+    print(f"token packed       {new*1e6:8.2f}us  {len(packed) - 1:3d} msgs  ~{new_tokens} tokens (budget {builder.history_budget})")
+
+if __name__ == "__main__":
+    main()
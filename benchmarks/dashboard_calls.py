@@ -0,0 +1,90 @@
+# rest calls made by live usage dashboards, old fetch+edit loop vs DashboardUpdater
+# discord's http layer is faked and time is sped up. run from repo root: python benchmarks/dashboard_calls.py [dashboards] [rounds]
+import asyncio
+import pathlib
+import sys
+from collections import Counter
+
+import discord
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.dashboard import DashboardUpdater
+
+DASHBOARDS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+TICK = 0.01
+INTERVAL = 0.05
+CHANGE_EVERY = 4 # the rendered stats only change every few refreshes
+RATE_LIMITED = 3 # first few edits come back as 429s
+
+class FakeResponse:
+    status = 429
+    reason = "Too Many Requests"
+
+class FakeMessage:
+    def __init__(self, http):
+        self.http = http
+
+    async def edit(self, embed):
+        self.http["PATCH message"] += 1
+        if self.http["PATCH message"] <= RATE_LIMITED:
+            raise discord.HTTPException(FakeResponse(), "rate limited")
+
+class FakeChannel:
+    def __init__(self, http):
+        self.http = http
+
+    async def fetch_message(self, message_id):
+        self.http["GET message"] += 1
+        return FakeMessage(self.http)
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self.http)
+
+class FakeBot:
+    def __init__(self, http):
+        self.channel = FakeChannel(http)
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+def make_render(counter):
+    async def render():
+        counter["renders"] += 1
+        embed = discord.Embed(title="usage", description=f"cpu {counter['renders'] // (CHANGE_EVERY * DASHBOARDS)}%")
+        embed.set_footer(text=f"render {counter['renders']}")
+        return embed
+    return render
+
+async def old_loop(bot, render):
+    # what update_usage_message_loop did per dashboard, every interval
+    for _ in range(ROUNDS):
+        try:
+            message = await bot.get_channel(1).fetch_message(1)
+            await message.edit(embed=await render())
+        except discord.HTTPException:
+            pass
+        await asyncio.sleep(INTERVAL)
+
+async def main():
+    old_http = Counter()
+    bot = FakeBot(old_http)
+    render = make_render(Counter())
+    await asyncio.gather(*(old_loop(bot, render) for _ in range(DASHBOARDS)))
+
+    new_http = Counter()
+    updater = DashboardUpdater(FakeBot(new_http), tick=TICK, wheel_size=8)
+    render = make_render(Counter())
+    for i in range(DASHBOARDS):
+        updater.add(("host", i), i, i, render, INTERVAL, delay=TICK)
+    updater.start()
+    await asyncio.sleep(ROUNDS * INTERVAL)
+    updater.stop()
+
+    print(f"{DASHBOARDS} dashboards, ~{ROUNDS} refreshes each, stats change every {CHANGE_EVERY} refreshes, first {RATE_LIMITED} edits 429")
+    print(f"fetch + edit loop  {sum(old_http.values()):4d} rest calls ({dict(old_http)})")
+    print(f"dashboard updater  {sum(new_http.values()):4d} rest calls ({dict(new_http)}), {updater.counters}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
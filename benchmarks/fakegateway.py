@@ -0,0 +1,245 @@
+# just enough of discord's rest api + gateway on localhost to run discord.py bots against, sharded or not
+# used by benchmarks/shards.py and benchmarks/loadtest.py, nothing here talks to the real discord
+import asyncio
+import itertools
+import json
+import time
+
+import discord
+import yarl
+from aiohttp import web, WSMsgType
+
+BOT_ID = 1000000000000000001
+APP_ID = 1000000000000000002
+OWNER_ID = 1000000000000000003
+DISCORD_EPOCH = 1420070400000
+
+_ids = itertools.count(1)
+
+def json_response(data) -> web.Response:
+    # discord.py only parses bodies whose content-type is exactly application/json, no charset
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+def snowflake(age_ms: int = 0) -> int:
+    # real looking ids so created_at and shard routing ((guild_id >> 22) % shards) behave
+    return ((int(time.time() * 1000) - DISCORD_EPOCH - age_ms) << 22) | (next(_ids) & 0x3FFFFF)
+
+def user_payload(user_id: int, name: str, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": name, "discriminator": "0", "global_name": name, "avatar": None, "bot": bot}
+
+def guild_payload(guild_id: int, channel_id: int) -> dict:
+    return {
+        "id": str(guild_id),
+        "name": f"guild-{guild_id}",
+        "icon": None,
+        "owner_id": str(OWNER_ID),
+        "features": [],
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "8", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+        "emojis": [],
+        "stickers": [],
+        "channels": [{"id": str(channel_id), "type": 0, "name": "general", "position": 0, "guild_id": str(guild_id),
+                      "permission_overwrites": [], "nsfw": False, "parent_id": None}],
+        "threads": [],
+        "members": [],
+        "member_count": 2,
+        "large": False,
+        "unavailable": False,
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "mfa_level": 0,
+        "premium_tier": 0,
+        "nsfw_level": 0,
+        "preferred_locale": "en-US",
+        "system_channel_flags": 0,
+        "voice_states": [],
+        "presences": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+        "soundboard_sounds": []
+    }
+
+class FakeDiscord:
+    def __init__(self, guilds: int = 4, recommended_shards: int = 1, heartbeat_interval: float = 0.5, rest_delay: float = 0.0):
+        self.recommended_shards = recommended_shards
+        self.heartbeat_interval = heartbeat_interval
+        self.rest_delay = rest_delay # pretend rtt on every rest call
+        # guild id -> its one text channel, guilds "created" 1ms apart so they spread over the shards
+        self.guilds = {snowflake(age_ms=i): snowflake() for i in range(guilds)}
+        self.shards = {} # (shard_id, shard_count) -> websocket
+        self.identified = []
+        self.sent_messages = [] # every message the bots posted
+        self.rest_calls = 0
+        self.on_response = None # (kind, id it answers, content) for replies to a message and interaction responses
+        self.runner = None
+        self.url = None
+
+    def shard_for(self, guild_id: int, shard_count: int) -> int:
+        return (guild_id >> 22) % shard_count
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/gateway", self.gateway)
+        app.router.add_route("*", "/api/v10/{path:.*}", self.rest)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        # point discord.py at us instead of discord.com / gateway.discord.gg
+        discord.http.Route.BASE = f"{self.url}/api/v10"
+        discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{port}/gateway")
+        return self
+
+    async def close(self):
+        for ws in list(self.shards.values()):
+            await ws.close()
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def rest(self, request: web.Request) -> web.Response:
+        self.rest_calls += 1
+        if self.rest_delay:
+            await asyncio.sleep(self.rest_delay)
+        path = request.match_info["path"]
+        method = request.method
+        if path == "users/@me":
+            return json_response(user_payload(BOT_ID, "kyra", bot=True))
+        if path == "oauth2/applications/@me":
+            return json_response({
+                "id": str(APP_ID), "name": "kyra", "description": "", "icon": None, "bot_public": False,
+                "bot_require_code_grant": False, "owner": user_payload(OWNER_ID, "owner"), "verify_key": "0" * 64,
+                "flags": 0, "interactions_endpoint_url": None
+            })
+        if path == "gateway/bot":
+            return json_response({
+                "url": f"ws://{request.host}/gateway", "shards": self.recommended_shards,
+                "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 16}
+            })
+        if path == "users/@me/channels" and method == "POST":
+            body = await self.read_body(request)
+            recipient = int(body.get("recipient_id", OWNER_ID))
+            return json_response({"id": str(recipient + 1), "type": 1, "recipients": [user_payload(recipient, f"user{recipient % 1000}")]})
+        if path.startswith("users/") and method == "GET":
+            user_id = int(path.split("/")[1])
+            return json_response(user_payload(user_id, f"user{user_id % 1000}"))
+        if path == "gateway":
+            return json_response({"url": f"ws://{request.host}/gateway"})
+        if path.endswith("/commands") and method == "PUT":
+            return json_response([])
+        if path.endswith("/typing"):
+            return web.Response(status=204)
+        if path.startswith("interactions/") and path.endswith("/callback"):
+            interaction_id = path.split("/")[1]
+            body = await self.read_body(request)
+            self.responded("interaction", int(interaction_id), (body.get("data") or {}).get("content"))
+            return json_response({"interaction": {"id": interaction_id, "type": 2}})
+        if path.startswith("webhooks/"):
+            # interaction followups / edits of the original response
+            body = await self.read_body(request)
+            return json_response(self.message_payload(0, BOT_ID, body.get("content") or "", author_bot=True))
+        if path.startswith("channels/") and path.endswith("/messages") and method == "POST":
+            channel_id = int(path.split("/")[1])
+            body = await self.read_body(request)
+            message = self.message_payload(channel_id, BOT_ID, body.get("content", ""), author_bot=True)
+            self.sent_messages.append(message)
+            reference = body.get("message_reference")
+            if reference:
+                self.responded("reply", int(reference["message_id"]), message["content"])
+            return json_response(message)
+        if path.startswith("channels/") and "/messages/" in path:
+            if method == "DELETE":
+                return web.Response(status=204)
+            channel_id = int(path.split("/")[1])
+            body = await self.read_body(request)
+            return json_response(self.message_payload(channel_id, BOT_ID, body.get("content", ""), author_bot=True))
+        return json_response({})
+
+    def responded(self, kind: str, answered_id: int, content):
+        if self.on_response:
+            self.on_response(kind, answered_id, content)
+
+    async def read_body(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == "payload_json":
+                    return json.loads(await part.text())
+        return {}
+
+    def message_payload(self, channel_id: int, author_id: int, content: str, author_bot: bool = False, mentions=()) -> dict:
+        guild_id = next((g for g, c in self.guilds.items() if c == channel_id), None)
+        return {
+            "id": str(snowflake()), "channel_id": str(channel_id), "guild_id": str(guild_id) if guild_id else None,
+            "author": user_payload(author_id, f"user{author_id % 1000}", bot=author_bot), "content": content,
+            "timestamp": discord.utils.utcnow().isoformat(), "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [user_payload(m, "kyra", bot=True) for m in mentions],
+            "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0
+        }
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        key = None
+        seq = itertools.count(1)
+        await ws.send_json({"op": 10, "d": {"heartbeat_interval": int(self.heartbeat_interval * 1000)}})
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                op = payload["op"]
+                if op == 1:
+                    await ws.send_json({"op": 11})
+                elif op == 2:
+                    shard_id, shard_count = payload["d"].get("shard", [0, 1])
+                    key = (shard_id, shard_count)
+                    self.shards[key] = ws
+                    self.identified.append(key)
+                    ws.seq = seq
+                    guilds = [g for g in self.guilds if self.shard_for(g, shard_count) == shard_id]
+                    await ws.send_json({"op": 0, "t": "READY", "s": next(seq), "d": {
+                        "v": 10, "user": user_payload(BOT_ID, "kyra", bot=True),
+                        "guilds": [{"id": str(g), "unavailable": True} for g in guilds],
+                        "session_id": f"session-{shard_id}", "resume_gateway_url": f"ws://{request.host}/gateway",
+                        "shard": [shard_id, shard_count], "application": {"id": str(APP_ID), "flags": 0}
+                    }})
+                    for guild_id in guilds:
+                        await ws.send_json({"op": 0, "t": "GUILD_CREATE", "s": next(seq), "d": guild_payload(guild_id, self.guilds[guild_id])})
+        finally:
+            if key and self.shards.get(key) is ws:
+                del self.shards[key]
+        return ws
+
+    async def dispatch(self, guild_id: int, event: str, data: dict) -> tuple:
+        # sends an event down whichever connected shard owns the guild, returns that shard's key
+        for (shard_id, shard_count), ws in self.shards.items():
+            if self.shard_for(guild_id, shard_count) == shard_id:
+                await ws.send_json({"op": 0, "t": event, "s": next(ws.seq), "d": data})
+                return shard_id, shard_count
+        raise LookupError(f"no shard connected for guild {guild_id}")
+
+    async def mention(self, guild_id: int, author_id: int, content: str) -> tuple:
+        channel_id = self.guilds[guild_id]
+        message = self.message_payload(channel_id, author_id, f"<@{BOT_ID}> {content}", mentions=(BOT_ID,))
+        return await self.dispatch(guild_id, "MESSAGE_CREATE", message)
+
+    async def interaction(self, guild_id: int, author_id: int, name: str, options: list = None, interaction_id: int = None) -> int:
+        # a slash cmd invocation, returns the interaction id the bot's response will carry
+        channel_id = self.guilds[guild_id]
+        interaction_id = interaction_id or snowflake()
+        data = {"id": str(interaction_id), "application_id": str(APP_ID), "type": 2, "token": f"token-{interaction_id}", "version": 1,
+                "data": {"id": str(snowflake()), "name": name, "type": 1, "options": options or []},
+                "guild_id": str(guild_id), "channel_id": str(channel_id),
+                "channel": {"id": str(channel_id), "type": 0, "name": "general", "guild_id": str(guild_id), "position": 0,
+                            "permission_overwrites": [], "nsfw": False, "parent_id": None},
+                "member": {"user": user_payload(author_id, f"user{author_id % 1000}"), "roles": [], "joined_at": discord.utils.utcnow().isoformat(),
+                           "deaf": False, "mute": False, "flags": 0, "permissions": "8"},
+                "app_permissions": "8", "locale": "en-US", "guild_locale": "en-US", "entitlements": [],
+                "authorizing_integration_owners": {"0": str(guild_id)}, "context": 0, "attachment_size_limit": 8 * 1024 ** 2}
+        await self.dispatch(guild_id, "INTERACTION_CREATE", data)
+        return interaction_id
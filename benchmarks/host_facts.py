@@ -0,0 +1,46 @@
+# upstream ip lookups across many usage refreshes, old (every refresh) vs HostFacts
+# uses a local stub instead of ipify, run from repo root: python benchmarks/host_facts.py [refreshes]
+import asyncio
+import pathlib
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.hostfacts import HostFacts
+
+REFRESHES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+async def main():
+    hits = {"count": 0}
+
+    async def ipify(request):
+        hits["count"] += 1
+        return web.Response(text="203.0.113.7")
+
+    app = web.Application()
+    app.router.add_get("/", ipify)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+    facts = HostFacts(public_ip_url=url)
+    start = time.perf_counter()
+    for _ in range(REFRESHES):
+        result = await facts.get()
+    elapsed = time.perf_counter() - start
+    assert result["public_ip"] == "203.0.113.7"
+    print(f"{REFRESHES} refreshes: {hits['count']} public ip lookups (old code: {REFRESHES}), {elapsed / REFRESHES * 1e6:.1f}us per refresh")
+
+    # offline: stub gone, last known ip is kept and nothing blows up
+    await runner.cleanup()
+    facts.next_refresh = 0
+    result = await facts.get()
+    print(f"offline refresh keeps {result['public_ip']}, retries in {facts.retry:.0f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
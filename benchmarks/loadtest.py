@@ -0,0 +1,337 @@
+# drives the real bot.py + commands/ against fakegateway.py and a stub completions api at fixed event rates:
+# mentions (on_message -> Chat.handle_mention -> call_groq_api), /ping, /report issue and /usage
+# reports throughput, latency percentiles, event loop lag and memory growth, and can diff against a saved baseline
+# run from repo root: python benchmarks/loadtest.py --duration 30 --save-baseline /tmp/kyra-baseline.json
+#                     python benchmarks/loadtest.py --duration 30 --baseline /tmp/kyra-baseline.json  (exit 1 on a regression)
+import argparse
+import asyncio
+import gc
+import json
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fakegateway import BOT_ID, FakeDiscord, snowflake
+from utils.metrics import Histogram
+
+ADMIN = 1000000000000000009
+KINDS = ("mention", "ping", "report", "usage")
+LATENCY_SLACK = 0.01 # diffs under 10ms never count as a regression, too noisy
+LOOP_LAG_SLACK = 0.02 # a few ms of lag jitter between runs is normal on a shared machine
+MEMORY_SLACK = 5 * 1024 ** 2
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="load test kyra against a fake discord and a stub llm")
+    parser.add_argument("--duration", type=float, default=20, help="measured secs, after the warmup")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--drain", type=float, default=15, help="max secs to wait for answers once sending stops")
+    parser.add_argument("--guilds", type=int, default=8)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--mentions", type=float, default=6, help="mentions per sec")
+    parser.add_argument("--pings", type=float, default=5, help="/ping per sec")
+    parser.add_argument("--reports", type=float, default=1, help="/report issue per sec")
+    parser.add_argument("--usage", type=float, default=0.2, help="/usage per sec, run by the admin")
+    parser.add_argument("--llm-latency", type=float, default=300, help="stub completion time in ms")
+    parser.add_argument("--llm-jitter", type=float, default=100, help="std dev of the stub completion time in ms")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of stub calls that fail, 0-1")
+    parser.add_argument("--llm-error-status", type=int, default=500)
+    parser.add_argument("--rest-delay", type=float, default=0, help="fake discord rest rtt in ms")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the CHAT_LIMIT_* mention limits on, throttled mentions show up as thr / lost")
+    parser.add_argument("--stream", action="store_true", help="AI_STREAM on, mention latency is then time to first visible chunk")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="json from an earlier --save-baseline to compare against")
+    parser.add_argument("--save-baseline", help="write this run's numbers here")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change that counts as a regression")
+    return parser.parse_args()
+
+class StubLLM:
+    # openai style completions endpoint with a latency distribution and injected failures
+    def __init__(self, latency: float, jitter: float, error_rate: float, error_status: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = 0
+        self.errors = 0
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1/chat/completions"
+        return self
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.calls += 1
+        body = await request.json()
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "injected failure"}}, status=self.error_status)
+        words = [f"reply to {len(body['messages'])} msgs ", "with ", "some ", "words"]
+        if not body.get("stream"):
+            return web.json_response({"choices": [{"message": {"role": "assistant", "content": "".join(words)}}]})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in words:
+            await response.write(f"data: {json.dumps({'choices': [{'delta': {'content': word}}]})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def close(self):
+        await self.runner.cleanup()
+
+class Recorder:
+    # matches the bot's answers to what we sent, via the reply's message_reference or the interaction id
+    def __init__(self):
+        self.pending = {} # answered id -> (kind, sent at, counted)
+        self.latency = {kind: Histogram() for kind in KINDS}
+        self.sent = dict.fromkeys(KINDS, 0)
+        self.done = dict.fromkeys(KINDS, 0)
+        self.throttled = dict.fromkeys(KINDS, 0)
+        self.measuring = False
+
+    def expect(self, answered_id: int, kind: str, sent_at: float):
+        self.pending[answered_id] = (kind, sent_at, self.measuring)
+        if self.measuring:
+            self.sent[kind] += 1
+
+    def on_response(self, kind_of_response: str, answered_id: int, content):
+        entry = self.pending.pop(answered_id, None)
+        if entry is None:
+            return # a dashboard edit, report DM etc.
+        kind, sent_at, counted = entry
+        if not counted:
+            return
+        if isinstance(content, str) and "catch my breath" in content:
+            self.throttled[kind] += 1 # a cooldown reply, fast by design so it stays out of the latencies
+            return
+        failed = isinstance(content, str) and (content.startswith("Sorry, I encountered an error") or "swamped" in content)
+        self.latency[kind].record(time.perf_counter() - sent_at, error=failed)
+        self.done[kind] += 1
+
+    def lost(self, kind: str) -> int:
+        return sum(1 for k, _, counted in self.pending.values() if k == kind and counted)
+
+def rss() -> int:
+    import psutil
+    return psutil.Process().memory_info().rss
+
+async def arrivals(rate: float, fire, stop: asyncio.Event, seed: int):
+    # open loop poisson arrivals, a slow bot doesn't slow the senders down
+    # own rng so the schedule is the same on every run with the same seed, whatever else draws random numbers
+    if rate <= 0:
+        return
+    rng = random.Random(seed)
+    while not stop.is_set():
+        await asyncio.sleep(rng.expovariate(rate))
+        asyncio.create_task(fire())
+
+def build_events(fake: FakeDiscord, recorder: Recorder, users: int):
+    guilds = list(fake.guilds)
+    counter = iter(range(10 ** 9))
+
+    def user():
+        return 2000000000000000000 + random.randrange(users)
+
+    async def mention():
+        n = next(counter)
+        guild_id = random.choice(guilds)
+        message = fake.message_payload(fake.guilds[guild_id], user(), f"<@{BOT_ID}> question {n}, what's a good name for a cat?", mentions=(BOT_ID,))
+        recorder.expect(int(message["id"]), "mention", time.perf_counter())
+        await fake.dispatch(guild_id, "MESSAGE_CREATE", message)
+
+    async def slash(kind: str, author: int, name: str, options: list = None):
+        interaction_id = snowflake()
+        recorder.expect(interaction_id, kind, time.perf_counter())
+        await fake.interaction(random.choice(guilds), author, name, options, interaction_id=interaction_id)
+
+    events = {
+        "mention": mention,
+        "ping": lambda: slash("ping", user(), "ping"),
+        "report": lambda: slash("report", user(), "report", [{"type": 1, "name": "issue", "options": [
+            {"type": 3, "name": "issue_type", "value": "user"},
+            {"type": 3, "name": "description", "value": f"spam in general #{next(counter)}"}
+        ]}]),
+        "usage": lambda: slash("usage", ADMIN, "usage", [{"type": 1, "name": "home-srv1", "options": []}])
+    }
+    return events
+
+def results(args, recorder: Recorder, stub: StubLLM, kyra_metrics, memory: dict) -> dict:
+    flat = {}
+    for kind in KINDS:
+        hist = recorder.latency[kind]
+        if not recorder.sent[kind]:
+            continue
+        flat[f"{kind}.throughput"] = recorder.done[kind] / args.duration
+        flat[f"{kind}.completed"] = recorder.done[kind] / recorder.sent[kind]
+        flat[f"{kind}.error_rate"] = (hist.errors + recorder.lost(kind)) / recorder.sent[kind]
+        for q in (0.5, 0.9, 0.99):
+            flat[f"{kind}.p{round(q * 100)}"] = hist.quantile(q)
+        flat[f"{kind}.max"] = hist.max
+    lag = kyra_metrics.histograms.get("loop.lag")
+    if lag:
+        flat["loop_lag.p50"] = lag.quantile(0.5)
+        flat["loop_lag.p99"] = lag.quantile(0.99)
+        flat["loop_lag.max"] = lag.max
+    flat["loop.blocked"] = kyra_metrics.events.get("loop.blocked", 0)
+    flat["memory.rss_growth"] = memory["growth"]
+    flat["memory.objects_growth"] = memory["objects"]
+    if recorder.sent["mention"]:
+        flat["llm.calls_per_mention"] = memory["llm_calls"] / recorder.sent["mention"]
+    return flat
+
+def print_report(args, recorder: Recorder, stub: StubLLM, kyra_metrics, memory: dict):
+    print(f"{args.duration:.0f}s at {args.mentions:g} mentions/s, {args.pings:g} pings/s, {args.reports:g} reports/s, {args.usage:g} usage/s; "
+          f"llm {args.llm_latency:.0f}±{args.llm_jitter:.0f}ms, {args.llm_error_rate * 100:.0f}% errors")
+    print(f"{'event':8s} {'sent':>6s} {'done':>6s} {'err':>5s} {'thr':>5s} {'lost':>5s} {'/s':>7s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}")
+    for kind in KINDS:
+        hist = recorder.latency[kind]
+        if not recorder.sent[kind]:
+            continue
+        print(f"{kind:8s} {recorder.sent[kind]:6d} {recorder.done[kind]:6d} {hist.errors:5d} {recorder.throttled[kind]:5d} {recorder.lost(kind):5d} {recorder.done[kind] / args.duration:7.2f}"
+              + "".join(f" {v * 1000:6.0f}ms" for v in (hist.quantile(0.5), hist.quantile(0.9), hist.quantile(0.99), hist.max)))
+    for name in ("chat.upstream", "chat.queue", "chat.completion", "report.delivery", "pool.thread.wait"):
+        hist = kyra_metrics.histograms.get(name)
+        if hist and hist.count:
+            print(f"  {name:18s} n={hist.count:<6d} p50 {hist.quantile(0.5) * 1000:6.0f}ms  p99 {hist.quantile(0.99) * 1000:6.0f}ms  err {hist.errors}")
+    lag = kyra_metrics.histograms.get("loop.lag")
+    if lag:
+        print(f"loop lag p50 {lag.quantile(0.5) * 1000:.1f}ms  p99 {lag.quantile(0.99) * 1000:.1f}ms  max {lag.max * 1000:.1f}ms  "
+              f"stalls flagged {kyra_metrics.events.get('loop.blocked', 0)}")
+    print(f"memory rss {memory['start'] / 1024 ** 2:.1f} -> {memory['end'] / 1024 ** 2:.1f} MiB ({memory['growth'] / 1024 ** 2:+.1f}), "
+          f"second half {memory['slope'] / 1024 ** 2:+.2f} MiB/min, gc objects {memory['objects']:+d}")
+    print(f"stub llm calls {stub.calls} ({stub.errors} injected failures), fake discord rest calls {memory['rest_calls']}")
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    # lower is better for everything but completion, throughput and max are shown but too noisy to judge on
+    regressions = []
+    print(f"\n{'vs baseline (ms, MiB)':24s} {'before':>10s} {'now':>10s} {'change':>8s}")
+    for name, before in baseline["results"].items():
+        now = current.get(name)
+        if now is None:
+            continue
+        change = (now - before) / before if before else 0.0
+        if name.endswith(".throughput") or name.endswith(".max"):
+            worse = False
+        elif name.endswith(".completed"):
+            worse = now < before - 0.02
+        elif name.endswith(".error_rate"):
+            worse = now > before + 0.01
+        elif name.startswith("memory.rss"):
+            worse = now > before + max(MEMORY_SLACK, abs(before) * tolerance)
+        elif name.startswith("memory.objects") or name == "loop.blocked" or name.startswith("llm."):
+            worse = now > max(before * (1 + tolerance), before + 1000 if name.startswith("memory") else before)
+        else:
+            slack = LOOP_LAG_SLACK if name.startswith("loop_lag") else LATENCY_SLACK
+            worse = now > before * (1 + tolerance) and now - before > slack
+        scale = 1000 if name.split(".")[-1] in ("p50", "p90", "p99", "max") else 1 / 1024 ** 2 if name.startswith("memory.rss") else 1
+        print(f"{name:24s} {before * scale:10.3f} {now * scale:10.3f} {change * 100:+7.1f}%{'  <- regression' if worse else ''}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    stub = await StubLLM(args.llm_latency / 1000, args.llm_jitter / 1000, args.llm_error_rate, args.llm_error_status).start()
+    fake = await FakeDiscord(guilds=args.guilds, heartbeat_interval=5, rest_delay=args.rest_delay / 1000).start()
+    os.environ.update({
+        "AI_URL": stub.url, "AI_KEY": "loadtest", "ADMIN_ID": str(ADMIN), "AI_STREAM": str(args.stream).lower(),
+        "REPORT_COALESCE": "1", "METRICS_LISTEN": "", "COMMANDS_WATCH": "false"
+    })
+    if not args.rate_limits:
+        os.environ.update({"CHAT_LIMIT_USER": "0", "CHAT_LIMIT_CHANNEL": "0", "CHAT_LIMIT_GUILD": "0"})
+    import bot as kyra
+    from utils.metrics import metrics as kyra_metrics
+
+    recorder = Recorder()
+    fake.on_response = recorder.on_response
+    task = asyncio.create_task(kyra.bot.start("fake-token"))
+    await asyncio.wait_for(kyra.bot.wait_until_ready(), 15)
+    usage = kyra.bot.module_state.get("usage")
+    if usage:
+        usage.facts.public_ip_url = None # no lookups against the real internet
+
+    events = build_events(fake, recorder, args.users)
+    rates = {"mention": args.mentions, "ping": args.pings, "report": args.reports, "usage": args.usage}
+    stop = asyncio.Event()
+    senders = [asyncio.create_task(arrivals(rates[kind], events[kind], stop, args.seed + i)) for i, kind in enumerate(KINDS)]
+
+    await asyncio.sleep(args.warmup)
+    kyra_metrics.histograms.clear()
+    kyra_metrics.events.clear()
+    gc.collect()
+    memory = {"start": rss(), "objects": len(gc.get_objects()), "llm_calls": stub.calls}
+    samples = []
+    recorder.measuring = True
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(1)
+        samples.append((time.monotonic() - started, rss()))
+    recorder.measuring = False
+    stop.set()
+    await asyncio.gather(*senders)
+
+    deadline = time.monotonic() + args.drain
+    while any(counted for _, _, counted in recorder.pending.values()) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    gc.collect()
+    memory["end"] = rss()
+    memory["growth"] = memory["end"] - memory["start"]
+    memory["objects"] = len(gc.get_objects()) - memory["objects"]
+    half = [s for s in samples if s[0] >= args.duration / 2]
+    memory["slope"] = (half[-1][1] - half[0][1]) / max(1e-9, half[-1][0] - half[0][0]) * 60 if len(half) > 1 else 0.0
+    memory["rest_calls"] = fake.rest_calls
+    memory["llm_calls"] = stub.calls - memory["llm_calls"]
+
+    print_report(args, recorder, stub, kyra_metrics, memory)
+    current = results(args, recorder, stub, kyra_metrics, memory)
+
+    await kyra.bot.close()
+    await task
+    await fake.close()
+    await stub.close()
+    return current
+
+def main():
+    args = parse_args()
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text())
+    save = pathlib.Path(args.save_baseline).resolve() if args.save_baseline else None
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # chat.db, reports.db, usage json, action log etc land here instead of the repo
+        os.environ["COMMAND_HASH_FILE"] = os.path.join(tmp, ".command_hash")
+        os.environ["CHAT_DB"] = os.path.join(tmp, "chat.db")
+        os.environ["REPORT_DB"] = os.path.join(tmp, "reports.db")
+        current = asyncio.run(run(args))
+    config = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "tolerance")}
+    if save:
+        save.write_text(json.dumps({"config": config, "results": current}, indent=2))
+        print(f"baseline saved to {save}")
+    if baseline:
+        if baseline.get("config") != config:
+            changed = sorted(k for k in config if baseline.get("config", {}).get(k) != config[k])
+            print(f"note: run settings differ from the baseline's ({', '.join(changed)})")
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("no regressions")
+
+if __name__ == "__main__":
+    main()
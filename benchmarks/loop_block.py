@@ -0,0 +1,79 @@
+# what blocking work does to the event loop, inline vs WorkerPool, and whether the watchdog catches it
+# run from repo root: python benchmarks/loop_block.py
+import asyncio
+import logging
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.metrics import metrics
+from utils.pool import WorkerPool
+from utils.watchdog import LoopWatchdog
+
+BLOCK = 0.3
+
+def slow_disk_write():
+    time.sleep(BLOCK) # stands in for a stuck fsync / dns lookup / sync http call
+
+def busy_python(n: int = 3_000_000) -> int:
+    # pure python, holds the gil the whole time
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+def lag(name: str) -> str:
+    hist = metrics.histograms["loop.lag"]
+    return f"{name:30s} loop lag p50 {hist.quantile(0.5) * 1000:6.1f} ms  p99 {hist.quantile(0.99) * 1000:6.1f} ms  max {hist.max * 1000:6.1f} ms"
+
+def reset():
+    metrics.histograms.clear()
+
+async def scenario(name: str, work):
+    reset()
+    await asyncio.sleep(0.2) # a few clean heartbeats first
+    await work()
+    await asyncio.sleep(0.2)
+    print(lag(name))
+
+async def main():
+    logging.basicConfig(level=logging.WARNING, format="  watchdog: %(message)s", stream=sys.stdout)
+    watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+    watchdog.start()
+    pool = WorkerPool(threads=4, processes=2, max_pending=16, timeout=2)
+
+    async def inline():
+        slow_disk_write()
+
+    await scenario("sleep inline on the loop", inline)
+    await scenario("sleep via pool.run", lambda: pool.run(slow_disk_write))
+    print(f"watchdog flagged {watchdog.blocks} stall(s)\n")
+
+    async def threads():
+        await asyncio.gather(*(pool.run(busy_python) for _ in range(4)))
+
+    async def processes():
+        await asyncio.gather(*(pool.run_cpu(busy_python) for _ in range(4)))
+
+    await pool.run_cpu(busy_python, 10) # pay the process start up front
+    await scenario("cpu work on threads (gil)", threads)
+    await scenario("cpu work via pool.run_cpu", processes)
+
+    reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.run(time.sleep, 0.05) for _ in range(64)))
+    waits = metrics.histograms["pool.thread.wait"]
+    print(f"\n64 x 50ms jobs on 4 threads, 16 pending max: {(time.perf_counter() - started) * 1000:.0f} ms total, "
+          f"queue wait p50 {waits.quantile(0.5) * 1000:.0f} ms / p99 {waits.quantile(0.99) * 1000:.0f} ms")
+    try:
+        await pool.run(time.sleep, 0.5, timeout=0.1)
+    except asyncio.TimeoutError:
+        print(f"timeout after 0.1s surfaced to the caller, pool.thread.timeout = {metrics.events['pool.thread.timeout']}")
+
+    watchdog.stop()
+    pool.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+# one user spamming mentions next to normal traffic, with and without the CHAT_LIMIT_* token buckets
+# uses a local stub api, run from repo root: python benchmarks/mention_limits.py [spam_per_sec] [secs]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+SPAM_RATE = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+BOT_ID = 999
+SPAMMER = 1
+
+upstream_calls = 0
+
+async def completions(request):
+    global upstream_calls
+    upstream_calls += 1
+    await request.json()
+    await asyncio.sleep(0.2)
+    return web.json_response({"choices": [{"message": {"role": "assistant", "content": "sure thing"}}]})
+
+async def start_stub():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeMessage:
+    def __init__(self, user_id: int, channel_id: int, content: str, replies: list):
+        self.author = SimpleNamespace(id=user_id)
+        self.guild = SimpleNamespace(id=1)
+        self.channel = SimpleNamespace(id=channel_id, typing=FakeTyping)
+        self.content = f"<@{BOT_ID}> {content}"
+        self.replies = replies
+
+    async def reply(self, content):
+        self.replies.append((self.author.id, content))
+
+async def run(chat_module, limited: bool):
+    global upstream_calls
+    chat = chat_module.Chat(bot=SimpleNamespace(user=SimpleNamespace(id=BOT_ID)))
+    await chat.start()
+    if not limited:
+        for scope in chat_module.SCOPES:
+            chat.limiter.configure(scope, 0, 0)
+    upstream_calls = 0
+    replies = []
+    tasks = []
+    started = time.perf_counter()
+    n = 0
+    # the spammer in channel 10, twenty regulars asking once each across channels 11-14
+    while time.perf_counter() - started < SECONDS:
+        n += 1
+        tasks.append(asyncio.create_task(chat.handle_mention(FakeMessage(SPAMMER, 10, f"spam {n}", replies))))
+        if n % max(1, int(SPAM_RATE * SECONDS / 20)) == 0 and n // max(1, int(SPAM_RATE * SECONDS / 20)) <= 20:
+            user = 100 + n
+            tasks.append(asyncio.create_task(chat.handle_mention(FakeMessage(user, 11 + user % 4, f"hi from {user}", replies))))
+        await asyncio.sleep(1 / SPAM_RATE)
+    await asyncio.gather(*tasks)
+    spam = [content for user, content in replies if user == SPAMMER]
+    regular = [content for user, content in replies if user != SPAMMER]
+    cooldowns = sum("catch my breath" in content for content in spam)
+    print(f"limits {'on ' if limited else 'off'}  spammer sent {n}, got {len(spam) - cooldowns} answers + {cooldowns} cooldown replies  "
+          f"regulars answered {sum(c == 'sure thing' for c in regular)}/{len(regular)}  upstream calls {upstream_calls}  "
+          f"done in {time.perf_counter() - started:.1f}s")
+    await chat.close()
+
+def check_cost(chat_module):
+    # O(1) per check, even with lots of live buckets, and idle ones get swept
+    limiter = chat_module.MentionLimiter({scope: (6, 3) for scope in ("user", "channel", "guild")}, sweep_interval=60)
+    for user in range(100_000):
+        limiter.check(user, user % 5000, user % 500, now=0.0)
+    started = time.perf_counter()
+    for i in range(100_000):
+        limiter.check(i, i % 5000, i % 500, now=1.0)
+    per_check = (time.perf_counter() - started) / 100_000
+    before = limiter.stats()["user_buckets"]
+    limiter.check(1, 1, 1, now=120.0) # past the sweep interval, everything's been idle long enough to refill
+    print(f"check with {before} user buckets live: {per_check * 1e6:.2f} us; after 2 idle minutes {limiter.stats()['user_buckets']} left, "
+          f"{limiter.stats()['expired']} expired")
+
+async def main():
+    runner, url = await start_stub()
+    os.environ["AI_URL"] = url
+    os.environ.setdefault("AI_KEY", "bench")
+    os.environ["AI_STREAM"] = "false"
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    from commands import chat as chat_module
+
+    await run(chat_module, False)
+    await run(chat_module, True)
+    await runner.cleanup()
+    from utils import ratelimit
+    check_cost(ratelimit)
+
+if __name__ == "__main__":
+    asyncio.run(main())
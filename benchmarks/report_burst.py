@@ -0,0 +1,163 @@
+# a raid's worth of /report issue calls: time to ack, DMs sent, retries and a restart with reports still queued
+# run from repo root: python benchmarks/report_burst.py [reports] [rest_delay_ms]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+os.environ["ADMIN_ID"] = "1"
+os.environ["REPORT_DB"] = os.path.join(tempfile.mkdtemp(), "reports.db")
+os.environ["REPORT_COALESCE"] = "0.2"
+
+import discord
+from discord import app_commands
+
+from commands import report as report_module
+
+REPORTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+REST_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+
+class FakeDM:
+    def __init__(self, bot):
+        self.bot = bot
+        self.id = 555
+
+    async def send(self, embed=None):
+        await self.bot.rest("send")
+        if self.bot.fail_sends:
+            self.bot.fail_sends -= 1
+            raise ConnectionResetError("discord went away")
+        # what the real api does with an oversized embed, plus one report it refuses no matter what
+        if len(embed) > 6000 or "POISON" in (embed.description or "") + "".join(f.value for f in embed.fields):
+            raise discord.HTTPException(SimpleNamespace(status=400, reason="Bad Request"), "Invalid Form Body")
+        self.bot.delivered.append(len(embed.fields) if embed.title.endswith("New Reports") else 1)
+
+class FakeBot:
+    # only what ReportQueue and the old code path touch, every "REST call" costs REST_DELAY
+    def __init__(self):
+        self.rest_calls = 0
+        self.fail_sends = 0
+        self.delivered = []
+        self.module_state = {}
+        self.cleanup_hooks = []
+
+    async def rest(self, what: str):
+        self.rest_calls += 1
+        await asyncio.sleep(REST_DELAY)
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        await self.rest("fetch_user")
+        return SimpleNamespace(dm_channel=None, create_dm=self.create_dm, send=self.old_send)
+
+    async def create_dm(self):
+        await self.rest("create_dm")
+        return FakeDM(self)
+
+    async def old_send(self, embed=None):
+        await (await self.create_dm()).send(embed=embed)
+
+    def get_partial_messageable(self, channel_id, type=None):
+        return FakeDM(self)
+
+class FakeTree:
+    def __init__(self):
+        self.commands = {}
+
+    def add_command(self, command):
+        self.commands[command.name] = command
+
+    def get_command(self, name):
+        return self.commands[name]
+
+def interaction(n: int, acks: list, started: float):
+    async def send_message(content, ephemeral=False):
+        acks.append(time.perf_counter() - started)
+
+    user = SimpleNamespace(name=f"user{n}", id=1000 + n, avatar=None)
+    return SimpleNamespace(user=user, channel=SimpleNamespace(name="general"), guild=SimpleNamespace(name="kyra hq"),
+                           response=SimpleNamespace(send_message=send_message))
+
+async def burst(group, acks: list):
+    started = time.perf_counter()
+    choice = app_commands.Choice(name="User Behavior", value="user")
+    await asyncio.gather(*(group.report.callback(group, interaction(n, acks, started), choice, f"spam raid #{n}") for n in range(REPORTS)))
+
+def ack_line(acks: list) -> str:
+    acks.sort()
+    return f"ack p50 {acks[len(acks) // 2] * 1000:7.1f} ms  max {acks[-1] * 1000:7.1f} ms"
+
+async def old_path():
+    # what the command used to do: fetch_user + open DM + send, all before the ack
+    bot = FakeBot()
+    acks = []
+    started = time.perf_counter()
+
+    async def one(n):
+        admin = await bot.fetch_user(1)
+        await admin.send(embed=report_module.report_embed({"description": f"spam raid #{n}", "reporter": "x", "reporter_id": n, "channel": "general",
+                                                          "guild": "kyra hq", "category": "User Behavior", "evidence": None, "avatar": None, "created": time.time()}))
+        acks.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(n) for n in range(REPORTS)))
+    print(f"old   {ack_line(acks)}  REST calls {bot.rest_calls:4d}  DMs {REPORTS}")
+
+async def wait_delivered(bot, count: int, timeout: float = 20):
+    queue = bot.module_state["report_queue"]
+    deadline = time.monotonic() + timeout
+    while (sum(bot.delivered) < count or queue.pending) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+async def queued_path():
+    bot = FakeBot()
+    bot.fail_sends = 1 # first DM bounces, has to come back on the retry
+    tree = FakeTree()
+    await report_module.setup(tree, bot)
+    queue = bot.module_state["report_queue"]
+    queue.base_backoff = 0.5
+    acks = []
+    await burst(tree.get_command("report"), acks)
+    await wait_delivered(bot, REPORTS)
+    print(f"new   {ack_line(acks)}  REST calls {bot.rest_calls:4d}  DMs {len(bot.delivered)} {bot.delivered}  "
+          f"failed sends {queue.counters['failed']}  delivered {sum(bot.delivered)}/{REPORTS}")
+
+    # a restart with everything still queued, the next process sends it and reuses the saved DM channel
+    queue.task.cancel()
+    await burst(tree.get_command("report"), [])
+    await queue.close()
+    bot.module_state.clear()
+    restarted = FakeBot()
+    await report_module.setup(FakeTree(), restarted)
+    await wait_delivered(restarted, REPORTS)
+    print(f"after restart: {restarted.module_state['report_queue'].pending} left, delivered {sum(restarted.delivered)}/{REPORTS} "
+          f"in {len(restarted.delivered)} DMs with {restarted.rest_calls} REST calls (no user/DM lookup)")
+    await restarted.module_state["report_queue"].close()
+
+async def poisoned_batch():
+    # long reports that only fit a few per embed, and one discord rejects outright
+    bot = FakeBot()
+    await report_module.setup(FakeTree(), bot)
+    queue = bot.module_state["report_queue"]
+    long = "x" * 3000
+    for n in range(10):
+        await queue.submit({"description": ("POISON " if n == 4 else "") + long, "reporter": f"user{n}", "reporter_id": n, "channel": "c" * 100,
+                            "guild": "g" * 100, "category": "Other", "evidence": long, "avatar": None, "created": time.time()})
+    await wait_delivered(bot, 9)
+    print(f"poisoned batch: delivered {sum(bot.delivered)}/9 good reports in {len(bot.delivered)} DMs {bot.delivered}, "
+          f"parked {queue.counters['parked']}, still queued {queue.pending}")
+    await queue.close()
+
+async def main():
+    await old_path()
+    await queued_path()
+    await poisoned_batch()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+# sharded mode against a mocked gateway: auto sharding, shard ranges split over "processes", /ping, shared chat history
+# run from repo root: python benchmarks/shards.py [guilds] [shards]
+import asyncio
+import importlib.util
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fakegateway import FakeDiscord
+
+GUILDS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+SHARDS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+class FastIdentifyBot(commands.AutoShardedBot):
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        pass # the real gateway wants 5s between identifies, the fake one doesn't care
+
+def make_bot(**shard_options):
+    bot = FastIdentifyBot(command_prefix=commands.when_mentioned, intents=discord.Intents.default(),
+                          guild_ready_timeout=0.2, **shard_options)
+    bot.seen = Counter()
+
+    @bot.event
+    async def on_message(message):
+        bot.seen[message.guild.shard_id] += 1
+
+    return bot
+
+async def start(bot):
+    task = asyncio.create_task(bot.start("fake-token"))
+    await asyncio.wait_for(bot.wait_until_ready(), 15)
+    return task
+
+async def ping(bot, guild):
+    spec = importlib.util.spec_from_file_location("commands.ping", ROOT / "commands" / "ping.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    await module.setup(bot.tree)
+    replies = []
+
+    async def send_message(content, ephemeral=False):
+        replies.append(content)
+
+    interaction = SimpleNamespace(client=bot, guild=guild, response=SimpleNamespace(send_message=send_message))
+    await bot.tree.get_command("ping").callback(interaction)
+    return replies[0]
+
+async def mention_all(fake, bots):
+    for guild_id in fake.guilds:
+        await fake.mention(guild_id, 42, "hey")
+    deadline = time.monotonic() + 5
+    while sum(sum(b.seen.values()) for b in bots) < len(fake.guilds) and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+
+async def auto_sharded(fake):
+    bot = make_bot()
+    started = time.perf_counter()
+    task = await start(bot)
+    ready = time.perf_counter() - started
+    await asyncio.sleep(fake.heartbeat_interval * 2) # let every shard get a heartbeat ack in
+    await mention_all(fake, [bot])
+    print(f"auto: discord recommended {bot.shard_count} shards, ready in {ready * 1000:.0f} ms, {len(bot.guilds)} guilds")
+    print(f"  mentions per shard {dict(sorted(bot.seen.items()))}")
+    print("  /ping ->", (await ping(bot, bot.guilds[0])).replace("\n", "\n  "))
+    await bot.close()
+    await task
+
+async def split_processes(fake):
+    # two bots with their own shard range, like two processes with SHARD_COUNT=4 SHARD_IDS=0-1 / 2-3
+    half = SHARDS // 2
+    bots = [make_bot(shard_count=SHARDS, shard_ids=list(range(half))), make_bot(shard_count=SHARDS, shard_ids=list(range(half, SHARDS)))]
+    tasks = [await start(bot) for bot in bots]
+    await mention_all(fake, bots)
+    for bot in bots:
+        owned = {g for g in fake.guilds if fake.shard_for(g, SHARDS) in bot.shard_ids}
+        print(f"shards {bot.shard_ids}: {len(bot.guilds)} guilds (expected {len(owned)}), "
+              f"mentions per shard {dict(sorted(bot.seen.items()))}, nothing foreign: {({g.id for g in bot.guilds} == owned)}")
+    for bot, task in zip(bots, tasks):
+        await bot.close()
+        await task
+
+async def shared_history():
+    # two shard processes, one chat.db: what one learns the other sees on the next mention
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    os.environ["CHAT_SHARED"] = "true"
+    from commands.chat import Chat
+
+    first, second = Chat(bot=None), Chat(bot=None)
+    await first.start()
+    await second.start()
+    await second.load_user("42") # second has (empty) memory of the user cached now
+    first.remember("42", {"role": "user", "content": "my cat is called miso"})
+    first.remember("42", {"role": "assistant", "content": "cute name"})
+    await first.store.flush()
+    await second.load_user("42")
+    print(f"shared history: second process sees {len(second.history.get('42'))} msgs from the first -> {second.history.get('42')[0]['content']!r}")
+    await first.close()
+    await second.close()
+
+async def main():
+    fake = await FakeDiscord(guilds=GUILDS, recommended_shards=SHARDS, heartbeat_interval=0.25).start()
+    try:
+        await auto_sharded(fake)
+        await split_processes(fake)
+    finally:
+        await fake.close()
+    await shared_history()
+    print(f"identifies seen by the fake gateway: {fake.identified}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
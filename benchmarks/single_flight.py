@@ -0,0 +1,86 @@
+# N users mention the bot with the same first-turn prompt at once, upstream calls with single-flight off vs on
+# uses a local stub api, run from repo root: python benchmarks/single_flight.py [users] [upstream_delay_ms]
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 500) / 1000
+BOT_ID = 999
+
+upstream_calls = 0
+
+async def completions(request):
+    global upstream_calls
+    upstream_calls += 1
+    await request.json()
+    await asyncio.sleep(DELAY)
+    return web.json_response({"choices": [{"message": {"role": "assistant", "content": "it's a new emoji pack"}}]})
+
+async def start_stub():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeMessage:
+    def __init__(self, user_id: int, content: str):
+        self.author = SimpleNamespace(id=user_id)
+        self.guild = SimpleNamespace(id=user_id) # own guild each, so per-guild queue limits stay out of it
+        self.channel = SimpleNamespace(id=user_id, typing=FakeTyping)
+        self.content = f"<@{BOT_ID}> {content}"
+        self.replies = []
+
+    async def reply(self, content):
+        self.replies.append(content)
+
+async def run(chat_module, single_flight: bool, offset: int):
+    global upstream_calls
+    chat_module.AI_SINGLE_FLIGHT = single_flight
+    chat = chat_module.Chat(bot=SimpleNamespace(user=SimpleNamespace(id=BOT_ID)))
+    await chat.start()
+    upstream_calls = 0
+    messages = [FakeMessage(offset + i, "what did they just announce?") for i in range(USERS)]
+    started = time.perf_counter()
+    await asyncio.gather(*(chat.handle_mention(message) for message in messages))
+    elapsed = time.perf_counter() - started
+    answered = sum(message.replies == ["it's a new emoji pack"] for message in messages)
+    remembered = sum(len(chat.history.get(str(message.author.id)) or []) == 2 for message in messages)
+    await chat.close()
+    print(f"single-flight {'on ' if single_flight else 'off'}  upstream calls {upstream_calls:3d}  "
+          f"answered {answered}/{USERS}  history updated {remembered}/{USERS}  wall {elapsed * 1000:7.1f} ms")
+
+async def main():
+    runner, url = await start_stub()
+    os.environ["AI_URL"] = url
+    os.environ.setdefault("AI_KEY", "bench")
+    os.environ["AI_CACHE"] = "false" # the reply cache would hide the effect after the first answer lands
+    os.environ["AI_STREAM"] = "false"
+    os.environ["CHAT_DB"] = os.path.join(tempfile.mkdtemp(), "chat.db")
+    from commands import chat as chat_module
+
+    await run(chat_module, False, 0)
+    await run(chat_module, True, USERS)
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+# cold start cost of the cmd modules and whether a restart would have to re-sync
+# nothing talks to discord, run from repo root: python benchmarks/startup.py
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+async def main():
+    started = time.perf_counter()
+    import bot as kyra
+    print(f"import bot.py (discord etc)  {(time.perf_counter() - started) * 1000:7.1f} ms")
+
+    async with kyra.bot:
+        started = time.perf_counter()
+        await kyra.load_commands(kyra.tree, kyra.bot)
+        print(f"load_commands total          {(time.perf_counter() - started) * 1000:7.1f} ms")
+        for name, (imported, setup) in sorted(kyra.bot.module_timings.items(), key=lambda item: -sum(item[1])):
+            print(f"  {name:22s} import {imported * 1000:6.1f} ms  setup {setup * 1000:6.1f} ms")
+        for name in ("psutil", "humanize"):
+            loaded = name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"
+            print(f"  {name} {'imported' if loaded else 'deferred'}")
+
+        started = time.perf_counter()
+        digest = kyra.command_tree_hash(kyra.tree)
+        print(f"command tree hash            {(time.perf_counter() - started) * 1000:7.1f} ms")
+        kyra.COMMAND_HASH_FILE.write_text(digest)
+        again = kyra.command_tree_hash(kyra.tree)
+        print(f"restart with same cmds -> {'skip sync' if again == digest else 'sync'}")
+        await kyra.bot.close()
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # chat.db, usage json etc land here instead of the repo
+        os.environ["COMMAND_HASH_FILE"] = os.path.join(tmp, ".command_hash")
+        asyncio.run(main())
@@ -0,0 +1,43 @@
+# append and query cost of the usage time-series store over a month of 30s samples
+# run from repo root: python benchmarks/timeseries.py [days]
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from utils.timeseries import TimeSeriesStore, sparkline
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+INTERVAL = 30
+METRICS = ("cpu", "memory", "load", "net", "power")
+
+def main():
+    rng = random.Random(1)
+    samples = DAYS * 86400 // INTERVAL
+    start_ts = 1_700_000_000
+
+    tracemalloc.start()
+    store = TimeSeriesStore(METRICS)
+    start = time.perf_counter()
+    for i in range(samples):
+        store.append(start_ts + i * INTERVAL, {m: rng.random() * 100 for m in METRICS})
+    append = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    queries = {"30 min @1m": ("1m", 30), "24h @1h": ("1h", 24), "30d @1d": ("1d", 30)}
+    print(f"{samples} samples ({DAYS} days @ {INTERVAL}s), {len(METRICS)} metrics")
+    print(f"append            {append / samples * 1e6:8.2f}us per sample, store holds {memory / 1024:.0f} KB")
+    for name, (tier, points) in queries.items():
+        rounds = 1000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            sparkline(store.query("cpu", tier, points), 0, 100)
+            store.summary("cpu", tier, points)
+        print(f"{name:<17} {(time.perf_counter() - start) / rounds * 1e6:8.2f}us per sparkline + summary")
+
+if __name__ == "__main__":
+    main()
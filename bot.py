@@ -8,13 +8,31 @@ import pathlib
 import logging
 from typing import Optional
 import inspect
+import hashlib
+import json
+import time
+import asyncio
+import atexit
+from utils.actionlog import setup_action_log
+from utils.metrics import metrics
+from utils.pool import WorkerPool
+from utils.watchdog import LoopWatchdog
 
-logging.basicConfig(
-    filename='actions.log',
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+load_dotenv()
+
+# json lines, written + rotated + gzipped off the event loop
+ACTION_LOG = os.getenv("ACTION_LOG", "actions.log")
+ACTION_LOG_MAX_BYTES = int(os.getenv("ACTION_LOG_MAX_BYTES", 10 * 1024 * 1024))
+ACTION_LOG_ROTATE_HOURS = float(os.getenv("ACTION_LOG_ROTATE_HOURS", 24))
+ACTION_LOG_BACKUPS = int(os.getenv("ACTION_LOG_BACKUPS", 7))
+
+log_listener = setup_action_log(
+    ACTION_LOG,
+    max_bytes=ACTION_LOG_MAX_BYTES,
+    interval=ACTION_LOG_ROTATE_HOURS * 3600,
+    backup_count=ACTION_LOG_BACKUPS
 )
+atexit.register(log_listener.stop) # drains whatever is still queued
 
 # action logger
 def log_action(action: str, user: Optional[discord.abc.User] = None, target: Optional[discord.abc.User] = None, reason: Optional[str] = None, extra: Optional[str] = None):
@@ -25,57 +43,297 @@ def log_action(action: str, user: Optional[discord.abc.User] = None, target: Opt
         msg += f" | Reason: {reason}"
     if extra:
         msg += f" | {extra}"
-    logging.info(msg)
-
-load_dotenv()
+    logging.info(msg, extra={"fields": {
+        "kind": "action",
+        "action": action,
+        "user_id": getattr(user, "id", None),
+        "target_id": getattr(target, "id", None),
+        "reason": reason
+    }})
 
 intents = discord.Intents.default()
 TOKEN = os.getenv("TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
-if ADMIN_ID is not None:
-    ADMIN_ID = int(ADMIN_ID)
+ADMIN_ID = int(ADMIN_ID) if ADMIN_ID else None
+
+def parse_shard_ids(value: Optional[str]) -> Optional[list]:
+    # "0-3" or "0,2,5", the shards this process runs out of SHARD_COUNT
+    if not value:
+        return None
+    ids = []
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        ids.extend(range(int(start), int(end or start) + 1))
+    return ids
+
+# sharding: SHARDED=true alone lets discord pick the count, SHARD_COUNT + SHARD_IDS splits shards over processes
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS"))
+SHARDED = os.getenv("SHARDED", "false").lower() in ("1", "true", "yes") or bool(SHARD_COUNT or SHARD_IDS)
+if SHARD_IDS and not SHARD_COUNT:
+    raise ValueError("SHARD_IDS needs SHARD_COUNT, the total across all processes")
+
+COMMANDS_DIR = pathlib.Path(__file__).resolve().parent / "commands"
+COMMAND_HASH_FILE = pathlib.Path(os.getenv("COMMAND_HASH_FILE", ".command_hash")) # last synced cmd tree, skips needless syncs
+METRICS_LISTEN = os.getenv("METRICS_LISTEN") # e.g. 127.0.0.1:9400 or unix:///run/kyra-metrics.sock, unset = no endpoint
+# blocking work goes to one bounded pool, see utils/pool.py
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 8))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 0)) # 0 = one per cpu, only started if something uses run_cpu
+WORKER_MAX_PENDING = int(os.getenv("WORKER_MAX_PENDING", 64))
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", 30))
+LOOP_BLOCK_MS = float(os.getenv("LOOP_BLOCK_MS", 250)) # warn with a stack when the loop stalls this long, 0 = off
+LOOP_DEBUG = os.getenv("LOOP_DEBUG", "false").lower() in ("1", "true", "yes") # asyncio debug mode, slow callbacks get logged
+COMMANDS_WATCH = os.getenv("COMMANDS_WATCH", "false").lower() in ("1", "true", "yes") # poll commands/ and hot reload changes
+COMMANDS_WATCH_INTERVAL = float(os.getenv("COMMANDS_WATCH_INTERVAL", 2))
+
+class KyraTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # local stamp for command latency, created_at is discord's clock and ours can be behind it
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+def since(started: Optional[float]) -> float:
+    return time.perf_counter() - started if started is not None else 0.0
 
-bot = commands.Bot(command_prefix=commands.when_mentioned_or(), intents=intents)
+class KyraBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cleanup_hooks = [] # coroutines cmds register to close their stuff on shutdown
+        self.module_timings = {} # module -> (import secs, setup secs)
+        self.command_modules = {} # module -> {"module", "commands"} of what's live right now
+        self.module_mtimes = {} # module -> mtime of the file we last tried, broken ones included
+        self.module_state = {} # objects cmd modules keep alive across reloads (chat history, usage loop...)
+        self.reload_lock = asyncio.Lock()
+        self.watch_task = None
+        self.pool = WorkerPool(threads=WORKER_THREADS, processes=WORKER_PROCESSES, max_pending=WORKER_MAX_PENDING, timeout=WORKER_TIMEOUT)
+        self.watchdog = LoopWatchdog(threshold=LOOP_BLOCK_MS / 1000) if LOOP_BLOCK_MS else None
+
+    async def setup_hook(self):
+        # runs once before connecting, on_ready fires again on every reconnect
+        # the utils take self.pool directly, anything else using asyncio.to_thread / run_in_executor(None) ends up on the same threads
+        self.loop.set_default_executor(self.pool.threads)
+        if self.watchdog:
+            self.watchdog.start(self.loop)
+        if LOOP_DEBUG:
+            self.loop.set_debug(True)
+            self.loop.slow_callback_duration = (LOOP_BLOCK_MS or 100) / 1000
+        await load_commands(self.tree, self)
+        await sync_commands(self.tree)
+        if METRICS_LISTEN:
+            runner = await metrics.start_server(METRICS_LISTEN)
+            self.cleanup_hooks.append(runner.cleanup)
+        if COMMANDS_WATCH:
+            self.watch_task = self.loop.create_task(watch_commands(self, COMMANDS_WATCH_INTERVAL))
+
+    async def reload_modules(self) -> dict:
+        return await reload_commands(self.tree, self)
+
+    async def close(self):
+        if self.watch_task:
+            self.watch_task.cancel()
+        for hook in self.cleanup_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                print(f"cleanup failed, error - {e}")
+        await super().close()
+        if self.watchdog:
+            self.watchdog.stop()
+        self.pool.shutdown()
+
+shard_options = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS} if SHARDED else {}
+bot = KyraBot(command_prefix=commands.when_mentioned_or(), intents=intents, tree_cls=KyraTree, **shard_options)
 tree = bot.tree
 
-async def load_commands(): # that old fetc for cmds
-    commands_path = pathlib.Path("commands")
-    for file in commands_path.glob("*.py"):
-        if file.name == "__init__.py":
+def command_files() -> dict:
+    return {f"commands.{file.stem}": file for file in sorted(COMMANDS_DIR.glob("*.py")) if file.name != "__init__.py"}
+
+def import_command_module(module_name: str, file: pathlib.Path):
+    spec = importlib.util.spec_from_file_location(module_name, file)
+    if not (spec and spec.loader):
+        raise ImportError(f"can't load {file}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+async def install_module(tree: app_commands.CommandTree, bot: commands.Bot, module_name: str, module):
+    # runs setup and remembers which cmds it added, a failed setup leaves nothing half registered
+    before = {cmd.name for cmd in tree.get_commands()}
+    try:
+        if hasattr(module, "setup"):
+            setup_params = inspect.signature(module.setup).parameters
+            if len(setup_params) > 1:
+                await module.setup(tree, bot)
+            else:
+                await module.setup(tree)
+    except Exception:
+        for cmd in tree.get_commands():
+            if cmd.name not in before:
+                tree.remove_command(cmd.name)
+        raise
+    added = [cmd for cmd in tree.get_commands() if cmd.name not in before]
+    bot.command_modules[module_name] = {"module": module, "commands": added}
+
+async def uninstall_module(tree: app_commands.CommandTree, bot: commands.Bot, module_name: str):
+    loaded = bot.command_modules.pop(module_name, None)
+    if not loaded:
+        return None
+    if hasattr(loaded["module"], "teardown"):
+        try:
+            await loaded["module"].teardown(tree, bot) # cancels the module's own tasks, state stays in bot.module_state
+        except Exception as e:
+            print(f"teardown of {module_name} failed, error - {e}")
+    for cmd in loaded["commands"]:
+        tree.remove_command(cmd.name)
+    return loaded
+
+async def load_commands(tree: app_commands.CommandTree, bot: commands.Bot): # that old fetc for cmds
+    for module_name, file in command_files().items():
+        bot.module_mtimes[module_name] = file.stat().st_mtime_ns
+        started = time.perf_counter()
+        try:
+            module = import_command_module(module_name, file)
+            imported = time.perf_counter()
+            await install_module(tree, bot, module_name, module)
+        except Exception as e:
+            # one broken cmd file shouldn't take the whole bot down
+            print(f"failed to load {module_name}, error - {e}")
             continue
-        module_name = f"commands.{file.stem}"
-        spec = importlib.util.spec_from_file_location(module_name, file)
-        if spec and spec.loader:
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            if hasattr(module, "setup"):
-                setup_params = inspect.signature(module.setup).parameters
-                if len(setup_params) > 1:
-                    await module.setup(tree, bot)
-                else:
-                    await module.setup(tree)
+        bot.module_timings[module_name] = (imported - started, time.perf_counter() - imported)
 
-@bot.event
-async def on_ready():
-    await bot.change_presence(status=discord.Status.online, activity=discord.Game(name="with you :)"))
-    await load_commands()
+async def reload_commands(tree: app_commands.CommandTree, bot: commands.Bot) -> dict:
+    # only touches files whose mtime moved, the old version stays live if the new one doesn't load
+    result = {"reloaded": [], "removed": [], "failed": {}, "synced": False}
+    async with bot.reload_lock:
+        files = command_files()
+        for module_name, file in files.items():
+            try:
+                mtime = file.stat().st_mtime_ns
+            except OSError:
+                continue
+            if bot.module_mtimes.get(module_name) == mtime:
+                continue
+            bot.module_mtimes[module_name] = mtime
+            try:
+                module = import_command_module(module_name, file)
+            except Exception as e:
+                result["failed"][module_name] = str(e)
+                continue
+
+            old = await uninstall_module(tree, bot, module_name)
+            try:
+                await install_module(tree, bot, module_name, module)
+            except Exception as e:
+                result["failed"][module_name] = str(e)
+                if old:
+                    try:
+                        await install_module(tree, bot, module_name, old["module"])
+                    except Exception as e:
+                        print(f"couldn't restore {module_name}, error - {e}")
+                continue
+            result["reloaded"].append(module_name)
+
+        for module_name in [name for name in bot.command_modules if name not in files]:
+            await uninstall_module(tree, bot, module_name)
+            bot.module_mtimes.pop(module_name, None)
+            result["removed"].append(module_name)
+
+        if result["reloaded"] or result["removed"]:
+            result["synced"] = await sync_commands(tree)
+    for module_name, error in result["failed"].items():
+        print(f"failed to reload {module_name}, error - {error}")
+    if result["reloaded"] or result["removed"]:
+        print(f"reloaded {result['reloaded']} removed {result['removed']}")
+    return result
+
+async def watch_commands(bot: commands.Bot, interval: float):
+    # plain mtime polling, a handful of stat calls every few secs
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload_commands(bot.tree, bot)
+        except Exception as e:
+            print(f"cmd reload failed, error - {e}")
+
+def command_tree_hash(tree: app_commands.CommandTree) -> str:
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands()), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+async def sync_commands(tree: app_commands.CommandTree, force: bool = False) -> bool:
+    # discord keeps the cmds between restarts, only push them when something actually changed
+    digest = command_tree_hash(tree)
+    try:
+        last = COMMAND_HASH_FILE.read_text().strip()
+    except OSError:
+        last = None
+    if not force and digest == last:
+        print("cmds unchanged, skipping sync")
+        return False
     try:
         synced = await tree.sync()
         print(f"synced {len(synced)} cmds")
     except Exception as e:
         print(f"failed to sync cmds, error - {e}")
+        return False
+    try:
+        COMMAND_HASH_FILE.write_text(digest)
+    except OSError as e:
+        print(f"couldn't save cmd hash, error - {e}")
+    return True
+
+@bot.event
+async def on_ready():
+    await bot.change_presence(status=discord.Status.online, activity=discord.Game(name="with you :)"))
+    if SHARDED:
+        print(f"ready on shards {sorted(bot.shards)} of {bot.shard_count}, {len(bot.guilds)} guilds")
 
 @bot.event
 async def on_app_command_completion(interaction: discord.Interaction, command: app_commands.Command):
     user = interaction.user
     channel = interaction.channel
-    logging.info(f"[SLASH] {user} (ID: {user.id}) ran /{command.name} in #{getattr(channel, 'name', 'DM')} (ID: {getattr(channel, 'id', 'DM')})")
+    latency = since(interaction.extras.get("started"))
+    metrics.observe(f"slash.{command.qualified_name}", latency)
+    logging.info("[SLASH] %s ran /%s", user, command.qualified_name, extra={"fields": {
+        "kind": "slash",
+        "command": command.qualified_name,
+        "user_id": user.id,
+        "channel_id": getattr(channel, "id", None),
+        "guild_id": interaction.guild_id,
+        "latency_ms": round(latency * 1000, 1)
+    }})
+
+@tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    latency = since(interaction.extras.get("started")) # not stamped if it failed before the check ran
+    metrics.observe(f"slash.{name}", latency, error=True)
+    logging.error("[SLASH] %s failed /%s", interaction.user, name, exc_info=error, extra={"fields": {
+        "kind": "slash_error",
+        "command": name,
+        "user_id": interaction.user.id,
+        "channel_id": interaction.channel_id,
+        "guild_id": interaction.guild_id,
+        "latency_ms": round(latency * 1000, 1)
+    }})
+
+@bot.event
+async def on_command(ctx):
+    ctx.started = time.perf_counter()
 
 @bot.event
 async def on_command_completion(ctx):
     user = ctx.author
     channel = ctx.channel
-    logging.info(f"[PREFIX] {user} (ID: {user.id}) ran {ctx.command} in #{getattr(channel, 'name', 'DM')} (ID: {getattr(channel, 'id', 'DM')})")
+    latency = since(getattr(ctx, "started", None))
+    metrics.observe(f"prefix.{ctx.command}", latency)
+    logging.info("[PREFIX] %s ran %s", user, ctx.command, extra={"fields": {
+        "kind": "prefix",
+        "command": str(ctx.command),
+        "user_id": user.id,
+        "channel_id": getattr(channel, "id", None),
+        "guild_id": getattr(ctx.guild, "id", None),
+        "latency_ms": round(latency * 1000, 1)
+    }})
 
 if __name__ == "__main__":
     if not TOKEN:
@@ -2,69 +2,408 @@ import discord
 from discord import app_commands
 import os
 import json
+import asyncio
+import time
+import math
 import aiohttp
 from dotenv import load_dotenv
+from utils.history import HistoryStore
+from utils.storage import ChatStore
+from utils.scheduler import RequestScheduler, RateLimited, SchedulerBusy
+from utils.cache import ResponseCache, normalize_prompt
+from utils.context import ContextBuilder
+from utils.metrics import metrics
+from utils.ratelimit import MentionLimiter, parse_limit, SCOPES
 
 load_dotenv()
 AI_KEY = os.getenv('AI_KEY')
+my_admin = os.getenv('ADMIN_ID')
+admin_user = int(my_admin) if my_admin else None
+AI_URL = os.getenv('AI_URL', "https://api.groq.com/openai/v1/chat/completions")
+AI_MODEL = os.getenv('AI_MODEL', "meta-llama/llama-prompt-guard-2-86m")
+AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', 500))
+AI_CONTEXT_TOKENS = int(os.getenv('AI_CONTEXT_TOKENS', 4096)) # prompt + reply budget, history fills what's left
+
+# http pool settings, one session is shared by every mention
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', 30))
+AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', 5))
+AI_POOL_SIZE = int(os.getenv('AI_POOL_SIZE', 20))
+AI_POOL_PER_HOST = int(os.getenv('AI_POOL_PER_HOST', 10))
+AI_KEEPALIVE = float(os.getenv('AI_KEEPALIVE', 60))
+
+# streaming replies, edits are spaced out so we stay clear of discord's edit rate limit
+AI_STREAM = os.getenv('AI_STREAM', 'true').lower() in ('1', 'true', 'yes', 'on')
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.0))
+MAX_MESSAGE_LENGTH = 2000
+
+# conversation memory limits
+HISTORY_WINDOW = int(os.getenv('HISTORY_WINDOW', 20))
+HISTORY_MAX_USERS = int(os.getenv('HISTORY_MAX_USERS', 5000))
+HISTORY_TTL = float(os.getenv('HISTORY_TTL', 21600))
+HISTORY_MAX_BYTES = int(os.getenv('HISTORY_MAX_BYTES', 8 * 1024 * 1024))
+
+# on-disk chat memory and channel opt-outs
+CHAT_DB = os.getenv('CHAT_DB', 'chat.db')
+# several shard processes on one chat.db, memory is then only trusted after checking the db
+CHAT_SHARED = os.getenv('CHAT_SHARED', 'true' if os.getenv('SHARD_IDS') else 'false').lower() in ('1', 'true', 'yes', 'on')
+CHAT_FLUSH_INTERVAL = float(os.getenv('CHAT_FLUSH_INTERVAL', 0.25 if CHAT_SHARED else 2.0))
+
+# upstream request scheduling
+AI_MAX_CONCURRENT = int(os.getenv('AI_MAX_CONCURRENT', 4))
+AI_MAX_PER_GUILD = int(os.getenv('AI_MAX_PER_GUILD', 2))
+AI_MAX_QUEUE_WAIT = float(os.getenv('AI_MAX_QUEUE_WAIT', 60))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', 3))
+
+# cached replies for first-turn prompts like "hey", turns that depend on history always skip it
+AI_CACHE = os.getenv('AI_CACHE', 'true').lower() in ('1', 'true', 'yes', 'on')
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', 1000))
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', 3600))
+# identical first-turn prompts arriving together share one upstream call (e.g. everyone reacting to one announcement)
+AI_SINGLE_FLIGHT = os.getenv('AI_SINGLE_FLIGHT', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+# token buckets checked before any network work, "per minute/burst", 0 = off, changeable at runtime via /chat settings
+CHAT_LIMIT_USER = os.getenv('CHAT_LIMIT_USER', '6/3')
+CHAT_LIMIT_CHANNEL = os.getenv('CHAT_LIMIT_CHANNEL', '30/10')
+CHAT_LIMIT_GUILD = os.getenv('CHAT_LIMIT_GUILD', '60/20')
+
+BUSY_MESSAGE = "i'm a bit swamped rn, give me a sec and try again <:Pepe_Business:1162565546500436079>"
+
+COOLDOWN_MESSAGE = "whoa, easy there! give me {seconds}s to catch my breath <:Pepe_Business:1162565546500436079>"
+
+SYSTEM_PROMPT = "you are Kyra, CTO of QeinTech. you are smart, kind, and a bit playful, but professional when it counts. you talk like a real, approachable person — clear, casual, and human. powered by Qeinova-1, stay friendly and causally less professional and more like a drunk human."
 
 class ChatAction(discord.app_commands.Choice):
     on = 1
     off = 2
     reset = 3
+    limits = 4
 
 class Chat:
-    def __init__(self, bot: discord.Client):
+    def __init__(self, bot: discord.Client, previous: "Chat" = None):
         self.bot = bot
-        self.conversation_history = {}
-        self.disabled_channels = set()
-        
-    async def call_groq_api(self, user_id: str, message: str) -> str:
-        if not AI_KEY:
-            return "add ai key in .env file"
-            
-        if user_id not in self.conversation_history:
-            self.conversation_history[user_id] = []
-            
-        self.conversation_history[user_id].append({"role": "user", "content": message})
+        if previous: # hot reload, history/db/session/queue stay as they are and only the code around them is new
+            self.history = previous.history
+            self.disabled_channels = previous.disabled_channels
+            self.store = previous.store
+            self.session = previous.session
+            self.scheduler = previous.scheduler
+            self.cache = previous.cache
+            self.limiter = previous.limiter
+        else:
+            self.history = HistoryStore(
+                window=HISTORY_WINDOW,
+                max_users=HISTORY_MAX_USERS,
+                ttl=HISTORY_TTL,
+                max_bytes=HISTORY_MAX_BYTES
+            )
+            self.disabled_channels = set()
+            self.store = ChatStore(CHAT_DB, keep=HISTORY_WINDOW, flush_interval=CHAT_FLUSH_INTERVAL)
+            self.session = None
+            self.scheduler = RequestScheduler(
+                max_concurrent=AI_MAX_CONCURRENT,
+                per_guild=AI_MAX_PER_GUILD,
+                max_wait=AI_MAX_QUEUE_WAIT,
+                max_retries=AI_MAX_RETRIES
+            )
+            self.cache = ResponseCache(max_entries=AI_CACHE_SIZE, ttl=AI_CACHE_TTL)
+            self.limiter = MentionLimiter({
+                "user": parse_limit(CHAT_LIMIT_USER),
+                "channel": parse_limit(CHAT_LIMIT_CHANNEL),
+                "guild": parse_limit(CHAT_LIMIT_GUILD)
+            })
+        self.context = ContextBuilder(SYSTEM_PROMPT, context_tokens=AI_CONTEXT_TOKENS, max_tokens=AI_MAX_TOKENS)
+        self.flights = {} # cache key -> (future, leader user id) of first-turn prompts already on their way upstream
+
+    async def start(self):
+        self.disabled_channels = await self.store.open()
+        # limits changed through /chat settings win over the env ones
+        for key, value in (await self.store.load_settings()).items():
+            scope = key.removeprefix("limit.")
+            if scope in SCOPES:
+                self.limiter.configure(scope, *parse_limit(value))
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # made lazily so it binds to the running loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=AI_POOL_SIZE,
+                limit_per_host=AI_POOL_PER_HOST,
+                keepalive_timeout=AI_KEEPALIVE,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(total=AI_TIMEOUT, sock_connect=AI_CONNECT_TIMEOUT)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        await self.store.close()
+
+    def remember(self, user_id: str, entry: dict):
+        self.history.append(user_id, entry)
+        self.store.add_message(user_id, entry)
+
+    async def load_user(self, user_id: str):
+        # pull history from disk the first time we see someone (or after they got evicted)
+        if self.store.conn is None or (user_id in self.history and not CHAT_SHARED):
+            return
+        # shared: another shard process may have talked to them since, so the db copy wins
+        entries, last = await self.store.load_history(user_id)
+        self.history.clear(user_id)
+        for entry in entries:
+            self.history.append(user_id, entry, at=last)
+
+    def reset_user(self, user_id: str) -> bool:
+        cleared = self.history.clear(user_id)
+        self.store.clear_user(user_id)
+        return cleared
+
+    def set_channel_enabled(self, channel_id: int, enabled: bool):
+        if enabled:
+            self.disabled_channels.discard(channel_id)
+        else:
+            self.disabled_channels.add(channel_id)
+        self.store.set_channel_disabled(channel_id, not enabled)
         
-        messages = [
-            {"role": "system", "content": "you are Kyra, CTO of QeinTech. you are smart, kind, and a bit playful, but professional when it counts. you talk like a real, approachable person — clear, casual, and human. powered by Qeinova-1, stay friendly and causally less professional and more like a drunk human."},
-            *self.conversation_history[user_id][-5:]
+    def set_limit(self, scope: str, per_minute: float, burst: int):
+        self.limiter.configure(scope, per_minute, burst)
+        self.store.set_setting(f"limit.{scope}", f"{per_minute:g}/{burst}")
+
+    def stats_lines(self) -> list:
+        history = self.history.stats()
+        queue = self.scheduler.stats()
+        cache = self.cache.stats()
+        limits = self.limiter.stats()
+        return [
+            f"memory: {history['users']} users, {history['bytes'] / 1024:.1f} KB, {history['evictions']} evicted, {history['expirations']} expired",
+            f"queue: {queue['queue_depth']} waiting, {queue['in_flight']} in flight, wait p50 {queue['wait_p50'] * 1000:.0f}ms / p95 {queue['wait_p95'] * 1000:.0f}ms",
+            f"upstream: {queue.get('submitted', 0)} submitted, {queue.get('merged', 0)} merged, {queue.get('dropped', 0)} dropped, "
+            f"{queue.get('rate_limited', 0)} rate limited, {queue.get('retries', 0)} retries",
+            f"cache: {cache['entries']} entries, {cache['hits']} hits / {cache['misses']} misses "
+            f"({cache['hit_ratio'] * 100:.1f}%), {cache['saved']:.1f}s upstream time saved",
+            f"limits: {limits['limited']} of {limits['allowed'] + limits['limited']} mentions throttled, {limits['warned']} cooldown replies, "
+            f"{limits['user_buckets']} user / {limits['channel_buckets']} channel / {limits['guild_buckets']} guild buckets"
         ]
+
+    async def build_messages(self, user_id: str, message: str) -> list:
+        await self.load_user(user_id)
+        self.remember(user_id, {"role": "user", "content": message})
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.groq.com/openai/v1/chat/completions",
+        return self.context.build(self.history.get(user_id))
+
+    def cache_key(self, message: str) -> tuple:
+        return (AI_MODEL, normalize_prompt(message))
+
+    def cache_response(self, messages: list, message: str, response: str, latency: float):
+        # only system prompt + this msg means the answer didn't depend on earlier turns
+        if len(messages) != 2:
+            return
+        if AI_CACHE:
+            self.cache.put(self.cache_key(message), response, latency)
+        self.end_flight(self.cache_key(message), response)
+
+    def in_conversation(self, user_id: str) -> bool:
+        # history older than the cache ttl doesn't make a "hey" a follow-up, db rows never expire so this is what
+        # lets returning users hit the cache, only replies built without any history are ever stored in it
+        last = self.history.last_message(user_id)
+        return last is not None and time.time() - last < AI_CACHE_TTL
+
+    async def cached_reply(self, user_id: str, message: str):
+        await self.load_user(user_id)
+        if not AI_CACHE:
+            return None
+        if self.in_conversation(user_id):
+            return None
+        response = self.cache.get(self.cache_key(message))
+        if response is not None:
+            self.remember(user_id, {"role": "user", "content": message})
+            self.remember(user_id, {"role": "assistant", "content": response})
+        return response
+
+    def start_flight(self, user_id: str, message: str):
+        # the leader of a first-turn prompt, anyone asking the same meanwhile waits on this instead of going upstream
+        if not AI_SINGLE_FLIGHT or user_id in self.history:
+            return None
+        key = self.cache_key(message)
+        if key in self.flights:
+            return None
+        self.flights[key] = (asyncio.get_running_loop().create_future(), user_id)
+        return key
+
+    def end_flight(self, key: tuple, response: str = None):
+        # None tells the followers the leader failed, they then go upstream themselves
+        future, _ = self.flights.pop(key, (None, None))
+        if future and not future.done():
+            future.set_result(response)
+
+    async def join_flight(self, user_id: str, message: str):
+        # must be called right after load_user, with no await in between join and start_flight
+        if not AI_SINGLE_FLIGHT or self.in_conversation(user_id):
+            return None
+        flight = self.flights.get(self.cache_key(message))
+        if flight is None:
+            return None
+        future, leader = flight
+        response = await asyncio.shield(future)
+        if response is not None and user_id != leader:
+            self.remember(user_id, {"role": "user", "content": message})
+            self.remember(user_id, {"role": "assistant", "content": response})
+        return response
+
+    def build_payload(self, messages: list, stream: bool) -> dict:
+        return {
+            "model": AI_MODEL,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": AI_MAX_TOKENS,
+            "top_p": 1,
+            "stream": stream
+        }
+
+    async def post_completion(self, payload: dict) -> aiohttp.ClientResponse:
+        session = self.get_session()
+        started = time.perf_counter()
+        try:
+            response = await session.post(
+                AI_URL,
                 headers={
                     "Authorization": f"Bearer {AI_KEY}",
                     "Content-Type": "application/json"
                 },
-                json={
-                    "model": "meta-llama/llama-prompt-guard-2-86m",
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                    "top_p": 1,
-                    "stream": False
-                }
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    assistant_message = result['choices'][0]['message']['content']
-                    
-                    self.conversation_history[user_id].append(
-                        {"role": "assistant", "content": assistant_message}
-                    )
-                    
-                    return assistant_message
-                else:
-                    error_text = await response.text()
-                    return f"sorry i encountered an error, please try again later."
+                json=payload
+            )
+        except Exception:
+            metrics.observe("chat.upstream", time.perf_counter() - started, error=True)
+            raise
+        # time to response headers, reading the body/stream is counted in chat.completion
+        metrics.observe("chat.upstream", time.perf_counter() - started, error=response.status != 200)
+        if response.status == 429:
+            retry_after = response.headers.get("Retry-After")
+            response.release()
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise RateLimited(retry_after)
+        return response
+
+    async def call_groq_api(self, user_id: str, message: str) -> str:
+        if not AI_KEY:
+            return "add ai key in .env file"
+            
+        messages = await self.build_messages(user_id, message)
+        started = time.monotonic()
+        
+        response = await self.scheduler.retry(self.post_completion, self.build_payload(messages, stream=False))
+        async with response:
+            if response.status == 200:
+                result = await response.json()
+                assistant_message = result['choices'][0]['message']['content']
+                
+                self.remember(user_id, {"role": "assistant", "content": assistant_message})
+                self.cache_response(messages, message, assistant_message, time.monotonic() - started)
+                metrics.observe("chat.completion", time.monotonic() - started)
+                
+                return assistant_message
+            else:
+                error_text = await response.text()
+                metrics.observe("chat.completion", time.monotonic() - started, error=True)
+                return f"sorry i encountered an error, please try again later."
+
+    async def stream_groq_api(self, user_id: str, message: str):
+        # same as call_groq_api but yields text chunks off the sse stream as they land
+        if not AI_KEY:
+            yield "add ai key in .env file"
+            return
+
+        messages = await self.build_messages(user_id, message)
+        started = time.monotonic()
+
+        response = await self.scheduler.retry(self.post_completion, self.build_payload(messages, stream=True))
+        async with response:
+            if response.status != 200:
+                await response.text()
+                metrics.observe("chat.completion", time.monotonic() - started, error=True)
+                yield "sorry i encountered an error, please try again later."
+                return
+
+            parts = []
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta:
+                    if not parts:
+                        metrics.observe("chat.first_token", time.monotonic() - started)
+                    parts.append(delta)
+                    yield delta
+
+            metrics.observe("chat.completion", time.monotonic() - started, error=not parts)
+            if parts:
+                assistant_message = "".join(parts)
+                self.remember(user_id, {"role": "assistant", "content": assistant_message})
+                self.cache_response(messages, message, assistant_message, time.monotonic() - started)
+
+    async def stream_reply(self, message: discord.Message, content: str):
+        # post the first chunk asap, then keep editing the same msg every STREAM_EDIT_INTERVAL
+        loop = asyncio.get_running_loop()
+        sent_message = None
+        text = ""
+        shown = ""
+        last_edit = 0.0
+
+        async for delta in self.stream_groq_api(str(message.author.id), content):
+            text += delta
+            if not text.strip():
+                continue
+            if sent_message is None:
+                shown = text[:MAX_MESSAGE_LENGTH]
+                with metrics.timer("chat.reply"):
+                    sent_message = await message.reply(shown)
+                last_edit = loop.time()
+            elif loop.time() - last_edit >= STREAM_EDIT_INTERVAL and text[:MAX_MESSAGE_LENGTH] != shown:
+                shown = text[:MAX_MESSAGE_LENGTH]
+                with metrics.timer("chat.edit"):
+                    await sent_message.edit(content=shown)
+                last_edit = loop.time()
+
+        if sent_message is None:
+            return await message.reply("sorry i encountered an error, please try again later.")
+        if text[:MAX_MESSAGE_LENGTH] != shown:
+            with metrics.timer("chat.edit"):
+                await sent_message.edit(content=text[:MAX_MESSAGE_LENGTH])
+        return sent_message
+
+    def timed_job(self, func):
+        # records how long the job sat in the scheduler queue before it got a slot
+        queued = time.perf_counter()
+        async def run():
+            metrics.observe("chat.queue", time.perf_counter() - queued)
+            return await func()
+        return run
 
     async def handle_mention(self, message: discord.Message):
         if message.channel.id in self.disabled_channels:
             return
+
+        # spam gets a local cooldown reply at most, never a typing call or an upstream request
+        allowed, retry_after, scope, warn = self.limiter.check(
+            message.author.id, message.channel.id, message.guild.id if message.guild else None
+        )
+        if not allowed:
+            metrics.incr(f"chat.limited_{scope}")
+            if warn:
+                await message.reply(COOLDOWN_MESSAGE.format(seconds=math.ceil(retry_after)))
+            return
             
         content = message.content.replace(f'<@{self.bot.user.id}>', '').strip()
         
@@ -72,21 +411,48 @@ class Chat:
             await message.reply("Looks like you summoned me! What quest shall we embark upon? <:Pepe_Business:1162565546500436079>")
             return
 
+        user_id = str(message.author.id)
+        guild_id = message.guild.id if message.guild else None
+
+        started = time.perf_counter()
+        failed = False
         async with message.channel.typing():
             try:
-                response = await self.call_groq_api(str(message.author.id), content)
-                sent_message = await message.reply(response)
-                
-                thinking_messages = [msg async for msg in message.channel.history(limit=5) 
-                                  if msg.author == self.bot.user and "is thinking" in msg.content]
-                for thinking_msg in thinking_messages:
+                cached = await self.cached_reply(user_id, content)
+                shared = await self.join_flight(user_id, content) if cached is None else None
+                if cached is not None:
+                    metrics.incr("chat.cache_hit")
+                    with metrics.timer("chat.reply"):
+                        sent_message = await message.reply(cached)
+                elif shared is not None:
+                    metrics.incr("chat.single_flight")
+                    with metrics.timer("chat.reply"):
+                        sent_message = await message.reply(shared)
+                else:
+                    flight = self.start_flight(user_id, content)
                     try:
-                        await thinking_msg.delete()
-                    except:
-                        pass
+                        if AI_STREAM:
+                            sent_message = await self.scheduler.submit(
+                                user_id, guild_id, content, self.timed_job(lambda: self.stream_reply(message, content))
+                            )
+                        else:
+                            response = await self.scheduler.submit(
+                                user_id, guild_id, content, self.timed_job(lambda: self.call_groq_api(user_id, content))
+                            )
+                            with metrics.timer("chat.reply"):
+                                sent_message = await message.reply(response)
+                    finally:
+                        if flight:
+                            self.end_flight(flight)
                         
+            except (SchedulerBusy, RateLimited):
+                failed = True
+                metrics.incr("chat.busy")
+                await message.reply(BUSY_MESSAGE)
             except Exception as e:
+                failed = True
                 await message.reply(f"Sorry, I encountered an error: {str(e)}")
+        metrics.observe("chat.mention", time.perf_counter() - started, error=failed)
 
 class ChatCommands(app_commands.Group):
     def __init__(self, chat_instance: Chat):
@@ -98,30 +464,69 @@ class ChatCommands(app_commands.Group):
         app_commands.Choice(name="on", value=1),
         app_commands.Choice(name="off", value=2),
         app_commands.Choice(name="reset", value=3),
+        app_commands.Choice(name="limits", value=4),
     ])
-    async def chat_settings(self, interaction: discord.Interaction, action: app_commands.Choice[int]):
+    @app_commands.choices(scope=[app_commands.Choice(name=scope, value=scope) for scope in SCOPES])
+    @app_commands.describe(
+        scope="limits: which bucket to change, leave empty to just see the current limits",
+        per_minute="limits: mentions per minute, 0 turns this limit off",
+        burst="limits: how many mentions can come in back to back"
+    )
+    async def chat_settings(
+        self,
+        interaction: discord.Interaction,
+        action: app_commands.Choice[int],
+        scope: app_commands.Choice[str] = None,
+        per_minute: app_commands.Range[int, 0, 600] = None,
+        burst: app_commands.Range[int, 1, 100] = None
+    ):
         if action.value in [1, 2]: 
             if not interaction.user.guild_permissions.manage_channels:
                 await interaction.response.send_message("🔐 Permission spell failed, try again with power.", ephemeral=True)
                 return
                 
             if action.value == 1:
-                self.chat.disabled_channels.discard(interaction.channel.id)
+                self.chat.set_channel_enabled(interaction.channel.id, True)
                 await interaction.response.send_message("KyraAI has been enabled <:PepeWitch:1393629420312596641>", ephemeral=True)
             else:
-                self.chat.disabled_channels.add(interaction.channel.id)
+                self.chat.set_channel_enabled(interaction.channel.id, False)
                 await interaction.response.send_message("KyraAI has been disabled <:PepeWitch:1393629420312596641>", ephemeral=True)
         
         elif action.value == 3:
             user_id = str(interaction.user.id)
-            if user_id in self.chat.conversation_history:
-                del self.chat.conversation_history[user_id]
+            if self.chat.reset_user(user_id):
                 await interaction.response.send_message("<:SkaryHalloweenPumpkin:1167705320118816768> The archives have been swept clean.", ephemeral=True)
             else:
                 await interaction.response.send_message("<:Pepe_Business:1162565546500436079> The archive is already empty.", ephemeral=True)
 
+        elif action.value == 4:
+            # the limits are bot wide, so only the admin gets to touch them
+            if interaction.user.id != admin_user:
+                await interaction.response.send_message("🔐 Permission spell failed, try again with power.", ephemeral=True)
+                return
+
+            if scope and per_minute is not None:
+                self.chat.set_limit(scope.value, per_minute, burst or max(1, per_minute // 2))
+            limits = "\n".join(f"{name}: {self.chat.limiter.describe(name)}" for name in SCOPES)
+            await interaction.response.send_message(f"mention limits <:PepeWitch:1393629420312596641>\n```\n{limits}\n```", ephemeral=True)
+
+    @app_commands.command(name="stats", description="chat queue and memory stats")
+    async def chat_stats(self, interaction: discord.Interaction):
+        if interaction.user.id != admin_user:
+            await interaction.response.send_message("🔐 Permission spell failed, try again with power.", ephemeral=True)
+            return
+
+        await interaction.response.send_message("\n".join(self.chat.stats_lines()), ephemeral=True)
+
 async def setup(tree: app_commands.CommandTree, bot: discord.Client):
-    chat = Chat(bot)
+    state = getattr(bot, "module_state", {})
+    previous = state.get("chat")
+    chat = Chat(bot, previous)
+    state["chat"] = chat
+    if previous is None:
+        await chat.start()
+        if hasattr(bot, "cleanup_hooks"):
+            bot.cleanup_hooks.append(lambda: state["chat"].close())
     
     chat_commands = ChatCommands(chat)
     tree.add_command(chat_commands)
@@ -134,4 +539,8 @@ async def setup(tree: app_commands.CommandTree, bot: discord.Client):
         if bot.user.mentioned_in(message) and not message.mention_everyone:
             await chat.handle_mention(message)
             
-    return chat
\ No newline at end of file
+    return chat
+
+async def teardown(tree: app_commands.CommandTree, bot: discord.Client):
+    # drop the old handler, setup of the new version registers its own
+    bot.__dict__.pop("on_message", None)
@@ -0,0 +1,30 @@
+import discord
+from discord import app_commands, Embed
+import os
+from dotenv import load_dotenv
+from utils.metrics import metrics
+
+load_dotenv()
+my_admin = os.getenv('ADMIN_ID')
+admin_user = int(my_admin) if my_admin else None
+theme_color = 0x6f42c1
+
+async def setup(tree: app_commands.CommandTree):
+    @tree.command(name="metrics", description="latency and error rates per cmd and chat stage")
+    async def show_metrics(interaction: discord.Interaction):
+        if interaction.user.id != admin_user:
+            no_access = Embed(description="🔐 Permission spell failed, try again with power.", color=theme_color)
+            await interaction.response.send_message(embed=no_access, ephemeral=True)
+            return
+
+        lines = metrics.summary_lines()
+        if len(lines) == 1:
+            await interaction.response.send_message("nothing recorded yet", ephemeral=True)
+            return
+        body = ""
+        for line in lines:
+            if len(body) + len(line) > 1900: # discord's 2000 char cap, the full set is on METRICS_LISTEN
+                body += "..."
+                break
+            body += line + "\n"
+        await interaction.response.send_message(f"```\n{body}```", ephemeral=True)
@@ -1,8 +1,28 @@
+import math
 import discord
 from discord import app_commands
 
+def fmt_latency(seconds: float) -> str:
+    # nan/inf until the shard's first heartbeat ack
+    return f"{round(seconds * 1000)}ms" if math.isfinite(seconds) else "n/a"
+
 async def setup(tree: app_commands.CommandTree):
     @tree.command(name="ping", description="Check Nexia's latency")
     async def ping_command(interaction: discord.Interaction):
-        latency = round(interaction.client.latency * 1000)
-        await interaction.response.send_message(f"<:Check_Green:1392691341808632018> The arcane winds returned your ping in {latency}ms.", ephemeral=True)
\ No newline at end of file
+        client = interaction.client
+        latencies = getattr(client, "latencies", None) # only set on sharded bots
+        if not latencies:
+            latency = fmt_latency(client.latency)
+            await interaction.response.send_message(f"<:Check_Green:1392691341808632018> The arcane winds returned your ping in {latency}.", ephemeral=True)
+            return
+
+        shard_id = interaction.guild.shard_id if interaction.guild else 0
+        own = dict(latencies).get(shard_id, client.latency)
+        shards = " · ".join(f"#{sid} {fmt_latency(latency)}" for sid, latency in latencies[:25])
+        if len(latencies) > 25:
+            shards += f" · +{len(latencies) - 25} more"
+        await interaction.response.send_message(
+            f"<:Check_Green:1392691341808632018> The arcane winds returned your ping in {fmt_latency(own)} (shard {shard_id}).\n"
+            f"shards in this process: {shards}",
+            ephemeral=True
+        )
@@ -0,0 +1,27 @@
+import discord
+from discord import app_commands, Embed
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+my_admin = os.getenv('ADMIN_ID')
+admin_user = int(my_admin) if my_admin else None
+theme_color = 0x6f42c1
+
+async def setup(tree: app_commands.CommandTree, bot: discord.Client):
+    @tree.command(name="reload", description="reload changed cmd files without restarting")
+    async def reload_command(interaction: discord.Interaction):
+        if interaction.user.id != admin_user or not hasattr(bot, "reload_modules"):
+            no_access = Embed(description="🔐 Permission spell failed, try again with power.", color=theme_color)
+            await interaction.response.send_message(embed=no_access, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        result = await bot.reload_modules()
+        lines = [
+            f"reloaded: {', '.join(result['reloaded']) or 'nothing changed'}",
+            f"removed: {', '.join(result['removed']) or '-'}",
+            f"synced with discord: {'yes' if result['synced'] else 'no'}"
+        ]
+        lines += [f"failed {name}: {error}" for name, error in result["failed"].items()]
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
@@ -3,13 +3,93 @@ from discord import app_commands
 import os
 from dotenv import load_dotenv
 import datetime
+from utils.reports import ReportQueue
 
 load_dotenv()
 admin_user = int(os.getenv('ADMIN_ID')) if os.getenv('ADMIN_ID') else None
+REPORT_DB = os.getenv('REPORT_DB', 'reports.db')
+REPORT_COALESCE = float(os.getenv('REPORT_COALESCE', 2)) # reports within this many secs go out as one digest
+DIGEST_TEXT_LIMIT = 250 # description/evidence per report in a digest
+# discord's embed limits, anything over them is a 400 that no retry can fix
+EMBED_TOTAL_LIMIT = 6000
+EMBED_FIELDS_LIMIT = 25
+DESCRIPTION_LIMIT = 4096
+FIELD_VALUE_LIMIT = 1024
+
+def clip(text: str, limit: int = DIGEST_TEXT_LIMIT) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def report_embed(report: dict) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"<:Report_Message:1395536703049175070> New Report",
+        description=clip(report["description"], DESCRIPTION_LIMIT),
+        color=discord.Color.purple(),
+        timestamp=datetime.datetime.fromtimestamp(report["created"])
+    )
+    
+    embed.add_field(
+        name="Reporter",
+        value=f"{report['reporter']} (ID: {report['reporter_id']})",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Location",
+        value=clip(f"Channel: {report['channel']}\nServer: {report['guild']}\nCategory: {report['category']}", FIELD_VALUE_LIMIT),
+
+        inline=False
+    )
+    
+    if report["evidence"]:
+        embed.add_field(
+            name="Evidence",
+            value=clip(report["evidence"], FIELD_VALUE_LIMIT),
+            inline=False
+        )
+    
+    embed.set_thumbnail(url=report["avatar"])
+    return embed
+
+def digest_field(report: dict) -> tuple:
+    value = f"{clip(report['description'])}\n*{report['reporter']} ({report['reporter_id']}) in #{report['channel']}, {report['guild']} at <t:{int(report['created'])}:T>*"
+    if report["evidence"]:
+        value += f"\nEvidence: {clip(report['evidence'])}"
+    return report["category"], clip(value, FIELD_VALUE_LIMIT)
+
+def digest_embeds(reports: list) -> list:
+    # -> [(embed, how many of the reports it covers)], in order
+    # a burst (raid etc.) arrives as few messages as the 6000 char embed limit allows, a single report keeps the full layout
+    if len(reports) == 1:
+        return [(report_embed(reports[0]), 1)]
+    chunks = [[]]
+    used = 0
+    budget = EMBED_TOTAL_LIMIT - len("<:Report_Message:1395536703049175070> 999 New Reports")
+    for report in reports:
+        name, value = digest_field(report)
+        if chunks[-1] and (used + len(name) + len(value) > budget or len(chunks[-1]) >= EMBED_FIELDS_LIMIT):
+            chunks.append([])
+            used = 0
+        chunks[-1].append((report, name, value))
+        used += len(name) + len(value)
+    embeds = []
+    for chunk in chunks:
+        if len(chunk) == 1:
+            embeds.append((report_embed(chunk[0][0]), 1))
+            continue
+        embed = discord.Embed(
+            title=f"<:Report_Message:1395536703049175070> {len(chunk)} New Reports",
+            color=discord.Color.purple(),
+            timestamp=datetime.datetime.fromtimestamp(chunk[-1][0]["created"])
+        )
+        for _, name, value in chunk:
+            embed.add_field(name=name, value=value, inline=False)
+        embeds.append((embed, len(chunk)))
+    return embeds
 
 class Report(app_commands.Group):
-    def __init__(self, tree: app_commands.CommandTree):
+    def __init__(self, tree: app_commands.CommandTree, queue: ReportQueue = None):
         super().__init__(name="report", description="Report issues or concerns")
+        self.queue = queue
 
     @app_commands.command(name="issue", description="Report issues or concerns")
     @app_commands.choices(issue_type=[
@@ -26,40 +106,22 @@ class Report(app_commands.Group):
         description: str,
         evidence: str = None
     ):
-        embed = discord.Embed(
-            title=f"<:Report_Message:1395536703049175070> New Report",
-            description=description,
-            color=discord.Color.purple(),
-            timestamp=datetime.datetime.now()
-        )
-        
-        embed.add_field(
-            name="Reporter",
-            value=f"{interaction.user.name} (ID: {interaction.user.id})",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="Location",
-            value=f"Channel: {interaction.channel.name}\nServer: {interaction.guild.name}\nCategory: {issue_type.name}",
-
-            inline=False
-        )
-        
-        if evidence:
-            embed.add_field(
-                name="Evidence",
-                value=evidence,
-                inline=False
-            )
-        
-        embed.set_thumbnail(url=interaction.user.avatar.url if interaction.user.avatar else None)
+        report = {
+            "reporter": interaction.user.name,
+            "reporter_id": interaction.user.id,
+            "avatar": interaction.user.avatar.url if interaction.user.avatar else None,
+            "channel": getattr(interaction.channel, "name", "DM"),
+            "guild": interaction.guild.name if interaction.guild else "DM",
+            "category": issue_type.name,
+            "description": description,
+            "evidence": evidence,
+            "created": datetime.datetime.now().timestamp()
+        }
         
         try:
-            if admin_user:
-                admin = await interaction.client.fetch_user(admin_user)
-                if admin:
-                    await admin.send(embed=embed)
+            # delivery to the admin happens in the background, retried until it goes through
+            if self.queue:
+                await self.queue.submit(report)
             
             await interaction.response.send_message(
                 "<:policeofficer:1395537152074584104> Thank you for your report. It has been submitted.",
@@ -72,6 +134,16 @@ class Report(app_commands.Group):
                 ephemeral=True
             )
 
-async def setup(tree: app_commands.CommandTree):
-    report_group = Report(tree)
-    tree.add_command(report_group)
\ No newline at end of file
+async def setup(tree: app_commands.CommandTree, bot: discord.Client):
+    state = getattr(bot, "module_state", {})
+    queue = state.get("report_queue")
+    if queue is None and admin_user:
+        queue = ReportQueue(bot, REPORT_DB, admin_user, digest_embeds, coalesce=REPORT_COALESCE)
+        await queue.start()
+        state["report_queue"] = queue
+        if hasattr(bot, "cleanup_hooks"):
+            bot.cleanup_hooks.append(queue.close)
+    elif queue:
+        queue.render = digest_embeds # hot reload, pick up the new embed layout
+    report_group = Report(tree, queue)
+    tree.add_command(report_group)
@@ -12,6 +12,9 @@ theme_color = 0x6f42c1
 bot_started = datetime.utcnow()
 
 async def setup(tree: app_commands.CommandTree):
+    # a hot reload re-runs this file, the first start time is the one that counts
+    started = getattr(tree.client, "module_state", {}).setdefault("uptime_started", bot_started)
+
     @tree.command(name="uptime", description="bot uptime")
     async def show_uptime(interaction: discord.Interaction):
         if not interaction.user.id == admin_user:
@@ -20,7 +23,7 @@ async def setup(tree: app_commands.CommandTree):
             return
 
         now = datetime.utcnow()
-        time_running = now - bot_started
+        time_running = now - started
         
         d = time_running.days
         remaining = time_running.seconds
@@ -1,16 +1,18 @@
 import discord
 from discord import app_commands, Embed
 import datetime
-import platform
-import psutil
-import humanize
-import socket
-import requests
-import json
 import os
-import asyncio
 from dotenv import load_dotenv
-import time
+from utils.lazy import lazy_import
+from utils.sampler import SystemSampler
+from utils.hostfacts import HostFacts
+from utils.timeseries import sparkline
+from utils.hoststats import HostStats
+from utils.agentserver import AgentServer
+from utils.counters import CounterStore, atomic_write_json, read_json
+from utils.dashboard import DashboardUpdater
+
+humanize = lazy_import("humanize")
 
 load_dotenv()
 my_admin = os.getenv('ADMIN_ID')
@@ -20,169 +22,144 @@ theme_color = 0x6f42c1
 STATS_FILE = "usage_stats.json"
 USAGE_MSG_FILE = 'usage_message.json'
 UPDATE_INTERVAL = 30 # update in every 30 secs
+LOCAL_HOST = "home-srv1"
+AGENT_LISTEN = os.getenv('AGENT_LISTEN') # e.g. tcp://0.0.0.0:9300 or unix:///run/kyra-agent.sock, unset = no agents
+AGENT_TOKEN = os.getenv('AGENT_TOKEN') # required unless AGENT_LISTEN is loopback or a unix socket
+AGENT_MAX_HOSTS = int(os.getenv('AGENT_MAX_HOSTS', 32))
+AGENT_HOSTS = {name.strip() for name in os.getenv('AGENT_HOSTS', '').split(',') if name.strip()} or None # allow-list of agent names, unset = any
+STATS_FLUSH_INTERVAL = 300 # counters hit the disk at most this often (and on shutdown)
+
+# metric, label, fixed sparkline range (None = auto scale), value format
+TRENDS = (
+    ("cpu", "CPU", (0, 100), lambda v: f"{v:.1f}%"),
+    ("memory", "RAM", (0, 100), lambda v: f"{v:.1f}%"),
+    ("load", "Load", None, lambda v: f"{v:.2f}"),
+    ("net", "Net", None, lambda v: f"{humanize.naturalsize(v, binary=True)}/s"),
+    ("power", "Power", None, lambda v: f"{v:.1f} W")
+)
 
 class Usage(app_commands.Group):
-    def __init__(self, tree: app_commands.CommandTree, bot: discord.Client):
+    def __init__(self, tree: app_commands.CommandTree, bot: discord.Client, previous: "Usage" = None):
         super().__init__(name="usage", description="check server usage")
         self.bot = bot
-        self.start_time = datetime.datetime.now()
-        self.net_start = psutil.net_io_counters()
-        self.updating_task = None
-        self.usage_message_info = self.load_usage_message_info()
-        self.cumul = self.load_cumulative()
-        self.last_cpu_times = psutil.cpu_times()
-        self.last_power_calc_time = datetime.datetime.now()
-        self.bot.loop.create_task(self.start_updating_task())
-
-    def get_system_uptime(self):
-        try:
-            with open('/proc/uptime', 'r') as f: # fetch uptime this is for ubuntu
-                uptime_seconds = float(f.readline().split()[0])
-            return datetime.timedelta(seconds=uptime_seconds)
-        except:
-            return datetime.datetime.now() - datetime.datetime.fromtimestamp(psutil.boot_time())
-
-    async def get_accurate_cpu_usage(self):
-        psutil.cpu_percent() 
-        await asyncio.sleep(0.5)
-        total = psutil.cpu_percent()
-        return total
-
-    async def get_per_core_usage(self): # get accurate per core cpu usage.
-        psutil.cpu_percent(percpu=True)
-        await asyncio.sleep(0.5) 
-        return psutil.cpu_percent(percpu=True)
-
-    def calculate_power_usage(self):
-        try:
-            psutil.cpu_percent()
-            time.sleep(0.1)
-            cpu_percent = psutil.cpu_percent()
-            
-            memory = psutil.virtual_memory()
-            
-            #  cpu frequency
-            cpu_freq = psutil.cpu_freq()
-            if cpu_freq:
-                current_freq = cpu_freq.current
-            else:
-                current_freq = 2000 
-            
-            cpu_count = psutil.cpu_count(logical=True)
-            
-            base_power = 5
-            cpu_power = (cpu_percent / 100) * (current_freq / 1000) * 0.5 * cpu_count
-            memory_power = (memory.percent / 100) * 2
-            
-            io_power = 0
-            try:
-                disk_io = psutil.disk_io_counters()
-                net_io = psutil.net_io_counters()
-                if disk_io and disk_io.read_bytes + disk_io.write_bytes > 0:
-                    io_power += 2
-                if net_io and net_io.bytes_sent + net_io.bytes_recv > 0:
-                    io_power += 0.5
-            except:
-                pass
-            
-            total_power = base_power + cpu_power + memory_power + io_power
-            return max(total_power, 1)
-            
-        except Exception as e:
-            print(f"Error calculating power: {e}")
-            return 1
-
-    def load_cumulative(self):
-        if os.path.exists(STATS_FILE):
-            with open(STATS_FILE, "r") as f:
-                return json.load(f)
-        return {"power_wh": 0.0, "bytes": 0}
-
-    def save_cumulative(self):
-        with open(STATS_FILE, "w") as f:
-            json.dump(self.cumul, f)
-
-    def load_usage_message_info(self):
-        if os.path.exists(USAGE_MSG_FILE):
-            with open(USAGE_MSG_FILE, 'r') as f:
-                return json.load(f)
-        return None
-
-    def save_usage_message_info(self, info):
-        with open(USAGE_MSG_FILE, 'w') as f:
-            json.dump(info, f)
-
-    def get_local_ip(self):
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            s.connect(('1.1.1.1', 80))
-            ip = s.getsockname()[0]
-        except Exception:
-            ip = 'N/A'
-        finally:
-            s.close()
-        return ip
-
-    async def start_updating_task(self):
-        await self.bot.wait_until_ready()
-        if self.usage_message_info:
-            if not self.updating_task or self.updating_task.done():
-                self.updating_task = self.bot.loop.create_task(self.update_usage_message_loop())
-
-    async def update_usage_message_loop(self):
-        while True:
-            try:
-                await self.update_usage_message()
-            except Exception as e:
-                print(f"Error updating usage message: {e}")
-            await asyncio.sleep(UPDATE_INTERVAL)
-
-    async def update_usage_message(self):
-        if not self.usage_message_info:
-            return
-        channel = self.bot.get_channel(self.usage_message_info['channel_id'])
-        if not channel:
-            return
-        try:
-            message = await channel.fetch_message(self.usage_message_info['message_id'])
-            embed = await self.build_usage_embed()
-            await message.edit(embed=embed)
-        except Exception:
-            return
-
-    async def build_usage_embed(self):
-        now = datetime.datetime.now()
-        uptime = self.get_system_uptime()
-        hours_up = uptime.total_seconds() / 3600
-
-        # power consumption since last update
-        current_power = self.calculate_power_usage()
-        time_diff = (now - self.last_power_calc_time).total_seconds() / 3600
-        power_wh_since = current_power * time_diff
-        self.last_power_calc_time = now
-
-        net_now = psutil.net_io_counters()
-        bytes_since = (net_now.bytes_sent - self.net_start.bytes_sent) + (net_now.bytes_recv - self.net_start.bytes_recv)
-
-        self.cumul["power_wh"] += power_wh_since
-        self.cumul["bytes"] += bytes_since
-        self.save_cumulative()
-
-        uname = platform.uname()
-        cpu_percent = await self.get_accurate_cpu_usage()
-        per_core = await self.get_per_core_usage()
-        load1, load5, load15 = psutil.getloadavg()
-        vm = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        hostname = socket.gethostname()
-        try:
-            public_ip = requests.get("https://api.ipify.org").text
-        except:
-            public_ip = "N/A"
-        local_ip = self.get_local_ip()
+        if previous: # hot reload, keep counters/trends/agent connections and only rebuild the loop around them
+            self.start_time = previous.start_time
+            self.counters = previous.counters
+            self.local = previous.local
+            self.sampler = previous.sampler
+            self.facts = previous.facts
+            self.agents = previous.agents
+            dashboards = list(previous.dashboard_info.values())
+        else:
+            self.start_time = datetime.datetime.now()
+            self.counters = CounterStore(STATS_FILE, {"power_wh": 0.0, "bytes": 0}, flush_interval=STATS_FLUSH_INTERVAL, pool=bot.pool)
+            self.local = HostStats(LOCAL_HOST)
+            self.sampler = None
+            self.facts = HostFacts(pool=bot.pool)
+            self.agents = AgentServer(
+                AGENT_LISTEN, token=AGENT_TOKEN, offline_after=UPDATE_INTERVAL * 3, max_hosts=AGENT_MAX_HOSTS, allowed=AGENT_HOSTS
+            ) if AGENT_LISTEN else None
+            dashboards = self.load_usage_message_info()
+        self.updater = DashboardUpdater(bot, on_gone=self.dashboard_gone)
+        self.dashboard_info = {}
+        for info in dashboards:
+            self.add_dashboard(info, delay=self.updater.tick)
+        if self.sampler or any(host == LOCAL_HOST for host, _ in self.dashboard_info):
+            self.start_sampling()
+        self.updater.start(self.bot.loop)
+
+    def start_sampling(self) -> SystemSampler:
+        # psutil only gets pulled in once something actually wants this machine's stats
+        if self.sampler is None:
+            self.sampler = SystemSampler(interval=UPDATE_INTERVAL, pool=self.bot.pool)
+            self.sampler.start(self.bot.loop)
+        if self.record_sample not in self.sampler.listeners:
+            self.sampler.listeners.append(self.record_sample)
+        return self.sampler
+
+    def detach(self):
+        # stops what belongs to this instance only, the shared state keeps running for the next one
+        self.updater.stop()
+        if self.sampler and self.record_sample in self.sampler.listeners:
+            self.sampler.listeners.remove(self.record_sample)
+
+    async def close(self):
+        if self.sampler:
+            self.sampler.stop()
+        self.updater.stop()
+        if self.agents:
+            await self.agents.close()
+        await self.counters.close()
+
+    def record_sample(self, stats: dict):
+        power_wh, net_bytes = self.local.record(stats)
+        self.counters.add("power_wh", power_wh)
+        self.counters.add("bytes", net_bytes)
+
+    def trend_summary(self, host: HostStats, tier: str, points: int) -> str:
+        lines = []
+        for metric, label, bounds, fmt in TRENDS:
+            values = host.trends.query(metric, tier, points)
+            low, high = bounds or (None, None)
+            summary = host.trends.summary(metric, tier, points)
+            lines.append(f"{label:<5} {sparkline(values, low, high)} avg {fmt(summary['avg'])} | max {fmt(summary['max'])}")
+        return "```\n" + "\n".join(lines) + "\n```"
+
+    def load_usage_message_info(self) -> list:
+        info = read_json(USAGE_MSG_FILE)
+        if isinstance(info, dict): # old single dashboard format
+            info = [{**info, 'host': LOCAL_HOST}]
+        return info or []
+
+    async def save_usage_message_info(self):
+        await self.bot.pool.run(atomic_write_json, USAGE_MSG_FILE, list(self.dashboard_info.values()))
+
+    def add_dashboard(self, info: dict, delay: float = None):
+        host = info.get('host', LOCAL_HOST)
+        key = (host, info['channel_id'])
+        self.dashboard_info[key] = info
+        self.updater.add(key, info['channel_id'], info['message_id'], lambda: self.build_usage_embed(host), UPDATE_INTERVAL, delay=delay)
+
+    def dashboard_gone(self, key):
+        if self.dashboard_info.pop(key, None):
+            self.bot.loop.create_task(self.save_usage_message_info())
+
+    async def build_usage_embed(self, host_name: str = LOCAL_HOST):
+        # only reads the latest snapshot, all the blocking stuff happens in the sampler thread (or on the agent)
+        if host_name == LOCAL_HOST:
+            host = self.local
+            sampler = self.start_sampling()
+            stats = sampler.latest or await sampler.first_snapshot()
+            facts = await self.facts.get()
+            now = datetime.datetime.now()
+        else:
+            host = self.agents.hosts.get(host_name) if self.agents else None
+            if not host or not host.latest:
+                return Embed(description=f"no data from {host_name} yet, is its agent running?", color=theme_color)
+            stats = host.latest
+            facts = host.facts
+            now = datetime.datetime.fromtimestamp(stats["time"])
+        uptime = stats["uptime"]
+
+        # counters are kept up to date by record_sample, nothing gets written from here
+        power_wh_since = host.session["power_wh"]
+        bytes_since = host.session["bytes"]
+
+        cpu_percent = stats["cpu_percent"]
+        per_core = stats["per_core"]
+        load1, load5, load15 = stats["load"]
+        vm = stats["memory"]
+        disk = stats["disk"]
+        hostname = facts["hostname"]
+        public_ip = facts["public_ip"]
+        local_ip = facts["local_ip"]
 
         embed = Embed(title="<:Servers:1395546303035080714> Machine Usage Stats", color=theme_color)
-        embed.add_field(name="<:System:1394572109988237392> OS", value=f"{uname.system} {uname.release}", inline=True)
+        if host is not self.local:
+            embed.title += f" - {host_name}"
+            if not self.agents.online(host_name):
+                embed.description = "<:Warning:1392860065349763082> agent offline, showing its last sample"
+        embed.add_field(name="<:System:1394572109988237392> OS", value=facts["os"], inline=True)
         embed.add_field(name="<:Help_Icon:1207931111553105982> Hostname", value=hostname, inline=True)
         embed.add_field(name="<:Clock:1394589916352221278> System Uptime", value=str(uptime).split('.')[0], inline=True)
 
@@ -197,24 +174,28 @@ class Usage(app_commands.Group):
         embed.add_field(name="<:online_web:1392690979915694200> Public IP", value=public_ip, inline=True)
 
         embed.add_field(
-            name="<:emojigg_ETN:1394572161070530630> Since Boot (This Session)",
+            name="<:emojigg_ETN:1394572161070530630> Since Boot (This Session)" if host is self.local else "<:emojigg_ETN:1394572161070530630> Since Agent Connected",
             value=f"Power: {power_wh_since:.2f} Wh ({power_wh_since/1000:.3f} kWh)\n"
                   f"Bandwidth: {bytes_since/1024**2:.2f} MB ({bytes_since/1024**3:.3f} GB)",
             inline=False
         )
 
-        embed.add_field(
-            name="<:emojigg_ETN:1394572161070530630> Cumulative Total",
-            value=f"Power: {self.cumul['power_wh']:.2f} Wh ({self.cumul['power_wh']/1000:.3f} kWh)\n"
-                  f"Bandwidth: {self.cumul['bytes']/1024**2:.2f} MB ({self.cumul['bytes']/1024**3:.3f} GB)",
-            inline=False
-        )
+        if host is self.local:
+            embed.add_field(
+                name="<:emojigg_ETN:1394572161070530630> Cumulative Total",
+                value=f"Power: {self.counters['power_wh']:.2f} Wh ({self.counters['power_wh']/1000:.3f} kWh)\n"
+                      f"Bandwidth: {self.counters['bytes']/1024**2:.2f} MB ({self.counters['bytes']/1024**3:.3f} GB)",
+                inline=False
+            )
+
+        if host.trends.last_ts:
+            embed.add_field(name="<:cpu:1394571630906183701> Last 30 Min", value=self.trend_summary(host, "1m", 30), inline=False)
+            embed.add_field(name="<:cpu:1394571630906183701> Last 24 Hours", value=self.trend_summary(host, "1h", 24), inline=False)
 
         embed.set_footer(text=f"Last Updated: {now.strftime('%Y-%m-%d %H:%M:%S')}")
         return embed
 
-    @app_commands.command(name="home-srv1", description="show home server 1 usage")
-    async def usage(self, interaction: discord.Interaction):
+    async def send_dashboard(self, interaction: discord.Interaction, host: str):
         if interaction.user.id != admin_user:
             await interaction.response.send_message(
                 embed=Embed(description="🔐 Permission spell failed, try again with power.", color=theme_color),
@@ -223,32 +204,59 @@ class Usage(app_commands.Group):
             return
 
         await interaction.response.defer(ephemeral=False)
-        embed = await self.build_usage_embed()
-
-        # update old message
-        if self.usage_message_info:
-            channel = self.bot.get_channel(self.usage_message_info['channel_id'])
-            if channel:
-                try:
-                    message = await channel.fetch_message(self.usage_message_info['message_id'])
-                    await message.edit(embed=embed)
-                    await interaction.followup.send("Usage message updated and will continue to update ig", ephemeral=True)
-                    return
-                except Exception:
-                    pass  # pass a new msg if old dont exist
 
+        # update the one already in this channel
+        dashboard = self.updater.dashboards.get((host, interaction.channel.id))
+        if dashboard:
+            try:
+                await self.updater.update(dashboard, force=True)
+                await interaction.followup.send("Usage message updated and will continue to update ig", ephemeral=True)
+                return
+            except Exception:
+                self.updater.remove(dashboard.key)  # pass a new msg if old dont exist
+
+        embed = await self.build_usage_embed(host)
         msg = await interaction.channel.send(embed=embed)
-        self.usage_message_info = { # save info of sent msg
+        self.add_dashboard({ # save info of sent msg
+            'host': host,
             'guild_id': interaction.guild.id if interaction.guild else None,
             'channel_id': interaction.channel.id,
             'message_id': msg.id
-        }
-        self.save_usage_message_info(self.usage_message_info)
+        })
+        await self.save_usage_message_info()
         await interaction.followup.send("Usage message created and will be updated automatically", ephemeral=True)
 
-        if not self.updating_task or self.updating_task.done():
-            self.updating_task = self.bot.loop.create_task(self.update_usage_message_loop())
+    @app_commands.command(name=LOCAL_HOST, description="show home server 1 usage")
+    async def usage(self, interaction: discord.Interaction):
+        await self.send_dashboard(interaction, LOCAL_HOST)
+
+    @app_commands.command(name="host", description="show usage of a machine running agent.py")
+    async def host_usage(self, interaction: discord.Interaction, name: str):
+        await self.send_dashboard(interaction, name)
+
+    @host_usage.autocomplete("name")
+    async def host_autocomplete(self, interaction: discord.Interaction, current: str):
+        names = sorted(self.agents.hosts) if self.agents else []
+        return [app_commands.Choice(name=n, value=n) for n in names if current.lower() in n.lower()][:25]
 
 async def setup(tree: app_commands.CommandTree, bot: discord.Client):
-    usage_group = Usage(tree, bot)
-    tree.add_command(usage_group)
\ No newline at end of file
+    state = getattr(bot, "module_state", {})
+    previous = state.get("usage")
+    usage_group = Usage(tree, bot, previous)
+    state["usage"] = usage_group
+    if previous is None:
+        await usage_group.counters.open()
+        if usage_group.agents:
+            try:
+                await usage_group.agents.start()
+            except ValueError as e:
+                print(f"agent listener not started - {e}")
+                usage_group.agents = None
+        if hasattr(bot, "cleanup_hooks"):
+            bot.cleanup_hooks.append(lambda: state["usage"].close())
+    tree.add_command(usage_group)
+
+async def teardown(tree: app_commands.CommandTree, bot: discord.Client):
+    usage_group = getattr(bot, "module_state", {}).get("usage")
+    if usage_group:
+        usage_group.detach()
@@ -0,0 +1,75 @@
+import datetime
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+
+class JsonFormatter(logging.Formatter):
+    # one json object per line, whatever was passed as extra={"fields": {...}} goes in as keys
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class RotatingJsonFileHandler(logging.handlers.RotatingFileHandler):
+    # rolls over on size or age, whichever comes first, old files end up as actions.log.N.gz
+    def __init__(self, filename: str, max_bytes: int = 10 * 1024 * 1024, interval: float = 86400, backup_count: int = 7):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.namer = lambda name: name + ".gz"
+        self.rotator = gzip_rotator
+        try:
+            started = os.stat(filename).st_mtime
+        except OSError:
+            started = time.time()
+        self.rollover_at = started + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            try:
+                if os.path.getsize(self.baseFilename) > 0: # no point archiving an empty file
+                    return True
+            except OSError:
+                pass
+            self.rollover_at = time.time() + self.interval
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() formats and copies every record on the caller's thread, leave that to the listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_action_log(path: str, logger: logging.Logger = None, level: int = logging.INFO, max_bytes: int = 10 * 1024 * 1024,
+                     interval: float = 86400, backup_count: int = 7) -> logging.handlers.QueueListener:
+    # the loop only drops records on a queue, formatting, writes and gzip happen on the listener thread
+    logger = logger or logging.getLogger()
+    file_handler = RotatingJsonFileHandler(path, max_bytes=max_bytes, interval=interval, backup_count=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    logger.addHandler(LoopQueueHandler(records))
+    logger.setLevel(level)
+    listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,101 @@
+import datetime
+import struct
+from collections import namedtuple
+
+# frames are [u32 payload length][u8 type][payload], everything big endian
+VERSION = 1
+HELLO = 1
+SAMPLE = 2
+MAX_FRAME = 64 * 1024
+
+HEADER = struct.Struct("!IB")
+# time, cpu, load1/5/15, mem %, mem total, disk %, disk total, net sent/recv, power, uptime secs, core count
+SAMPLE_HEAD = struct.Struct("!dfffffQfQQQffH")
+
+DiskUsage = namedtuple("DiskUsage", "percent total")
+MemoryUsage = namedtuple("MemoryUsage", "percent total")
+NetCounters = namedtuple("NetCounters", "bytes_sent bytes_recv")
+
+class ProtocolError(Exception):
+    pass
+
+def frame(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(len(payload), kind) + payload
+
+def pack_str(value: str) -> bytes:
+    raw = (value or "").encode("utf-8")[:255]
+    return bytes([len(raw)]) + raw
+
+def unpack_strs(payload: bytes, offset: int, count: int):
+    values = []
+    for _ in range(count):
+        if offset >= len(payload):
+            raise ProtocolError("truncated string")
+        size = payload[offset]
+        values.append(payload[offset + 1:offset + 1 + size].decode("utf-8", "replace"))
+        offset += 1 + size
+    return values, offset
+
+def encode_hello(name: str, token: str, facts: dict) -> bytes:
+    payload = bytes([VERSION]) + b"".join(pack_str(v) for v in (
+        name, token, facts.get("os"), facts.get("hostname"), facts.get("local_ip"), facts.get("public_ip")
+    ))
+    return frame(HELLO, payload)
+
+def decode_hello(payload: bytes) -> dict:
+    if not payload or payload[0] != VERSION:
+        raise ProtocolError("unsupported agent version")
+    (name, token, os_name, hostname, local_ip, public_ip), _ = unpack_strs(payload, 1, 6)
+    return {
+        "name": name,
+        "token": token,
+        "facts": {"os": os_name, "hostname": hostname, "local_ip": local_ip or "N/A", "public_ip": public_ip or "N/A"}
+    }
+
+def encode_sample(stats: dict) -> bytes:
+    per_core = stats["per_core"]
+    load1, load5, load15 = stats["load"]
+    head = SAMPLE_HEAD.pack(
+        stats["time"], stats["cpu_percent"], load1, load5, load15,
+        stats["memory"].percent, stats["memory"].total,
+        stats["disk"].percent, stats["disk"].total,
+        stats["net"].bytes_sent, stats["net"].bytes_recv,
+        stats["power"], stats["uptime"].total_seconds(), len(per_core)
+    )
+    # per-core percentages as half floats, plenty for a dashboard
+    return frame(SAMPLE, head + struct.pack(f"!{len(per_core)}e", *per_core))
+
+def decode_sample(payload: bytes) -> dict:
+    if len(payload) < SAMPLE_HEAD.size:
+        raise ProtocolError("truncated sample")
+    (ts, cpu, load1, load5, load15, mem_percent, mem_total, disk_percent, disk_total,
+     sent, recv, power, uptime, cores) = SAMPLE_HEAD.unpack_from(payload)
+    if len(payload) != SAMPLE_HEAD.size + cores * 2:
+        raise ProtocolError("bad per-core length")
+    return {
+        "time": ts,
+        "cpu_percent": cpu,
+        "per_core": list(struct.unpack_from(f"!{cores}e", payload, SAMPLE_HEAD.size)),
+        "load": (load1, load5, load15),
+        "memory": MemoryUsage(mem_percent, mem_total),
+        "disk": DiskUsage(disk_percent, disk_total),
+        "net": NetCounters(sent, recv),
+        "power": power,
+        "uptime": datetime.timedelta(seconds=uptime)
+    }
+
+async def read_frame(reader) -> tuple:
+    header = await reader.readexactly(HEADER.size)
+    size, kind = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f"frame too big ({size} bytes)")
+    return kind, await reader.readexactly(size)
+
+def parse_address(address: str) -> tuple:
+    # "unix:///run/kyra.sock" or "tcp://host:port" / "host:port"
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
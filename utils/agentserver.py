@@ -0,0 +1,95 @@
+import asyncio
+import hmac
+import ipaddress
+import os
+import time
+
+from utils.agentproto import HELLO, SAMPLE, ProtocolError, decode_hello, decode_sample, parse_address, read_frame
+from utils.hoststats import HostStats
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False # a hostname, could resolve to anything
+
+class AgentServer:
+    # accepts persistent agent connections and keeps a HostStats per reporting machine
+    def __init__(self, address: str, token: str = None, offline_after: float = 90, max_hosts: int = 32, allowed: set = None):
+        self.address = address
+        self.token = token
+        self.offline_after = offline_after
+        self.max_hosts = max_hosts # names come from the agents, so they can't grow the dict without bound
+        self.allowed = allowed # only these names if set
+        self.hosts = {}
+        self.last_seen = {}
+        self.server = None
+        self.writers = set()
+        self.connections = 0
+        self.frames = 0
+        self.bytes = 0
+
+    async def start(self):
+        kind, target = parse_address(self.address)
+        if kind == "tcp" and not self.token and not is_loopback(target[0]):
+            # anyone who can reach the port could add hosts or fake their numbers
+            raise ValueError(f"refusing to accept agents on {self.address} without a token, set AGENT_TOKEN or listen on loopback/unix")
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target) # stale socket from a previous run
+            self.server = await asyncio.start_unix_server(self.handle, path=target)
+        else:
+            self.server = await asyncio.start_server(self.handle, *target)
+        return self.server
+
+    def online(self, name: str) -> bool:
+        seen = self.last_seen.get(name)
+        return seen is not None and time.monotonic() - seen < self.offline_after
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        name = None
+        self.connections += 1
+        self.writers.add(writer)
+        try:
+            kind, payload = await read_frame(reader)
+            if kind != HELLO:
+                raise ProtocolError("expected hello")
+            hello = decode_hello(payload)
+            if self.token and not hmac.compare_digest(hello["token"], self.token):
+                raise ProtocolError(f"bad token from {hello['name']}")
+            name = hello["name"]
+            host = self.hosts.get(name)
+            if host is None:
+                if self.allowed is not None and name not in self.allowed:
+                    raise ProtocolError(f"{name} isn't in AGENT_HOSTS")
+                if len(self.hosts) >= self.max_hosts:
+                    raise ProtocolError(f"already tracking {self.max_hosts} hosts")
+                host = self.hosts[name] = HostStats(name)
+            host.facts = hello["facts"]
+            self.last_seen[name] = time.monotonic()
+
+            while True:
+                kind, payload = await read_frame(reader)
+                self.frames += 1
+                self.bytes += len(payload) + 5
+                if kind == SAMPLE:
+                    host.record(decode_sample(payload))
+                    self.last_seen[name] = time.monotonic()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass # agent went away, it reconnects on its own
+        except ProtocolError as e:
+            print(f"dropping agent {name or '?'}: {e}")
+        finally:
+            self.connections -= 1
+            self.writers.discard(writer)
+            writer.close()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
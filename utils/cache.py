@@ -0,0 +1,52 @@
+import re
+import time
+from collections import OrderedDict
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(text: str) -> str:
+    # "Hey!!" / "hey" / "  HEY " all end up as the same key
+    text = PUNCTUATION.sub(" ", text.lower())
+    return WHITESPACE.sub(" ", text).strip()
+
+class ResponseCache:
+    # size bounded lru with a ttl, also tracks how much upstream time it saved
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict() # key -> (response, expires_at, latency)
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.saved += entry[2]
+        return entry[0]
+
+    def put(self, key, response: str, latency: float = 0.0):
+        self.entries[key] = (response, time.monotonic() + self.ttl, latency)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved": self.saved
+        }
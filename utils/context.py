@@ -0,0 +1,34 @@
+MESSAGE_OVERHEAD = 4 # role + framing tokens each message costs on top of its text
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    # rough but cheap, just a length so there's nothing worth caching (a cache would also keep old msgs alive)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+class ContextBuilder:
+    # packs the newest history that fits next to the system prompt and the reply budget
+    def __init__(self, system_prompt: str, context_tokens: int = 4096, max_tokens: int = 500):
+        self.system = {"role": "system", "content": system_prompt}
+        self.context_tokens = context_tokens
+        self.max_tokens = max_tokens
+        self.system_cost = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD
+
+    @property
+    def history_budget(self) -> int:
+        return max(0, self.context_tokens - self.max_tokens - self.system_cost)
+
+    def build(self, history: list) -> list:
+        budget = self.history_budget
+        picked = []
+        for entry in reversed(history):
+            cost = estimate_tokens(entry["content"]) + MESSAGE_OVERHEAD
+            if cost > budget:
+                if not picked:
+                    # the newest msg alone is too big, keep its tail rather than send nothing
+                    keep = max(0, budget - MESSAGE_OVERHEAD) * CHARS_PER_TOKEN
+                    picked.append({**entry, "content": entry["content"][-keep:] if keep else ""})
+                break
+            budget -= cost
+            picked.append(entry)
+        picked.reverse()
+        return [self.system, *picked]
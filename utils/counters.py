@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+import tempfile
+
+from utils.pool import run_blocking
+
+def atomic_write_json(path: str, data):
+    # temp file in the same dir + rename, so a crash never leaves a half written file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+class CounterStore:
+    # cumulative counters kept in memory, written out atomically every flush_interval
+    def __init__(self, path: str, defaults: dict, flush_interval: float = 60.0, pool=None):
+        self.path = path
+        self.pool = pool # the bot's WorkerPool, file io then counts against its cap and timeout
+        self.values = dict(defaults)
+        self.flush_interval = flush_interval
+        self.dirty = False
+        self.task = None
+
+    async def open(self):
+        try:
+            saved = await run_blocking(self.pool, read_json, self.path, {})
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            print(f"couldn't read {self.path}, starting from zero - {e}")
+            saved = {}
+        self.values.update(saved)
+        self.task = asyncio.create_task(self.flush_loop())
+
+    def add(self, name: str, delta):
+        if delta:
+            self.values[name] = self.values.get(name, 0) + delta
+            self.dirty = True
+
+    def __getitem__(self, name: str):
+        return self.values[name]
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            await run_blocking(self.pool, atomic_write_json, self.path, dict(self.values))
+        except Exception:
+            self.dirty = True
+            raise
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error saving {self.path}: {e}")
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
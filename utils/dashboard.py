@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import discord
+
+class Dashboard:
+    __slots__ = ("key", "channel_id", "message_id", "render", "interval", "partial", "last_payload", "backoff", "rounds")
+
+    def __init__(self, key, channel_id: int, message_id: int, render, interval: float):
+        self.key = key
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.render = render # async () -> Embed
+        self.interval = interval
+        self.partial = None
+        self.last_payload = None
+        self.backoff = 0.0
+        self.rounds = 0
+
+def comparable(embed: discord.Embed) -> dict:
+    # the footer/timestamp always changes, it alone isn't worth an edit
+    payload = embed.to_dict()
+    payload.pop("footer", None)
+    payload.pop("timestamp", None)
+    return payload
+
+class DashboardUpdater:
+    # keeps many live embeds fresh off one timer wheel, one PATCH per real change
+    def __init__(self, bot: discord.Client, tick: float = 1.0, wheel_size: int = 60, max_backoff: float = 600.0, on_gone=None):
+        self.bot = bot
+        self.tick = tick
+        self.wheel = [[] for _ in range(wheel_size)]
+        self.position = 0
+        self.dashboards = {}
+        self.max_backoff = max_backoff
+        self.on_gone = on_gone # called with the key when a message got deleted
+        self.task = None
+        self.counters = {"edits": 0, "skipped": 0, "rate_limited": 0, "failed": 0}
+
+    def add(self, key, channel_id: int, message_id: int, render, interval: float, delay: float = None):
+        self.remove(key)
+        dashboard = Dashboard(key, channel_id, message_id, render, interval)
+        self.dashboards[key] = dashboard
+        self.schedule(dashboard, interval if delay is None else delay)
+        return dashboard
+
+    def remove(self, key):
+        # the wheel entry is left behind and ignored once it fires
+        return self.dashboards.pop(key, None)
+
+    def schedule(self, dashboard: Dashboard, delay: float):
+        ticks = max(1, round(delay / self.tick))
+        dashboard.rounds = (ticks - 1) // len(self.wheel)
+        self.wheel[(self.position + ticks) % len(self.wheel)].append(dashboard)
+
+    def get_partial(self, dashboard: Dashboard):
+        if dashboard.partial is None:
+            channel = self.bot.get_channel(dashboard.channel_id)
+            if channel is None:
+                return None
+            dashboard.partial = channel.get_partial_message(dashboard.message_id)
+        return dashboard.partial
+
+    async def update(self, dashboard: Dashboard, force: bool = False) -> bool:
+        partial = self.get_partial(dashboard)
+        if partial is None:
+            return False # channel not cached (yet), try again next round
+        embed = await dashboard.render()
+        payload = comparable(embed)
+        if not force and payload == dashboard.last_payload:
+            self.counters["skipped"] += 1
+            return False
+        await partial.edit(embed=embed)
+        dashboard.last_payload = payload
+        self.counters["edits"] += 1
+        return True
+
+    async def run_one(self, dashboard: Dashboard):
+        delay = dashboard.interval
+        try:
+            await self.update(dashboard)
+            dashboard.backoff /= 2 # ease back in once discord is happy again
+        except (discord.RateLimited, discord.HTTPException) as e:
+            if isinstance(e, discord.NotFound):
+                self.remove(dashboard.key)
+                if self.on_gone:
+                    self.on_gone(dashboard.key)
+                return
+            if isinstance(e, discord.RateLimited) or getattr(e, "status", None) == 429:
+                self.counters["rate_limited"] += 1
+                retry_after = getattr(e, "retry_after", 0) or 0
+                dashboard.backoff = min(self.max_backoff, max(retry_after, dashboard.backoff * 2 or dashboard.interval))
+            else:
+                self.counters["failed"] += 1
+                print(f"Error updating dashboard {dashboard.key}: {e}")
+        except Exception as e:
+            self.counters["failed"] += 1
+            print(f"Error updating dashboard {dashboard.key}: {e}")
+        if self.dashboards.get(dashboard.key) is dashboard:
+            self.schedule(dashboard, delay + dashboard.backoff)
+
+    def advance(self):
+        self.position = (self.position + 1) % len(self.wheel)
+        slot = self.wheel[self.position]
+        self.wheel[self.position] = []
+        due = []
+        for dashboard in slot:
+            if self.dashboards.get(dashboard.key) is not dashboard:
+                continue
+            if dashboard.rounds:
+                dashboard.rounds -= 1
+                self.wheel[self.position].append(dashboard)
+            else:
+                due.append(dashboard)
+        return due
+
+    async def run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            for dashboard in self.advance():
+                asyncio.create_task(self.run_one(dashboard))
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if not self.task or self.task.done():
+            self.task = (loop or asyncio.get_running_loop()).create_task(self.run())
+        return self.task
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
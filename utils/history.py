@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict, deque
+
+ENTRY_OVERHEAD = 64 # rough per-message bytes on top of the text itself
+
+def entry_size(entry: dict) -> int:
+    return len(entry.get("content", "").encode("utf-8")) + ENTRY_OVERHEAD
+
+class HistoryStore:
+    # per-user ring buffers, least recently used users get evicted first
+    def __init__(self, window: int = 5, max_users: int = 5000, ttl: float = 21600, max_bytes: int = 8 * 1024 * 1024):
+        self.window = window
+        self.max_users = max_users
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.users = OrderedDict() # user_id -> [deque of entries, last_seen, bytes, wall time of the newest msg]
+        self.size_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def get(self, user_id: str) -> list:
+        self.expire()
+        slot = self.users.get(user_id)
+        if not slot:
+            return []
+        slot[1] = time.monotonic()
+        self.users.move_to_end(user_id)
+        return list(slot[0])
+
+    def last_message(self, user_id: str):
+        slot = self.users.get(user_id)
+        return slot[3] if slot else None
+
+    def append(self, user_id: str, entry: dict, at: float = None):
+        # at = when the msg was sent, for entries reloaded from disk
+        self.expire()
+        slot = self.users.get(user_id)
+        if slot is None:
+            slot = self.users[user_id] = [deque(maxlen=self.window), 0.0, 0, 0.0]
+        entries = slot[0]
+        if len(entries) == entries.maxlen:
+            dropped = entry_size(entries[0])
+            slot[2] -= dropped
+            self.size_bytes -= dropped
+        size = entry_size(entry)
+        entries.append(entry)
+        slot[1] = time.monotonic()
+        slot[2] += size
+        slot[3] = time.time() if at is None else at
+        self.size_bytes += size
+        self.users.move_to_end(user_id)
+        self.enforce_limits(keep=user_id)
+
+    def clear(self, user_id: str) -> bool:
+        slot = self.users.pop(user_id, None)
+        if slot is None:
+            return False
+        self.size_bytes -= slot[2]
+        return True
+
+    def expire(self):
+        # oldest first, so we can stop at the first user still inside the ttl
+        cutoff = time.monotonic() - self.ttl
+        while self.users:
+            user_id, slot = next(iter(self.users.items()))
+            if slot[1] > cutoff:
+                break
+            self.users.popitem(last=False)
+            self.size_bytes -= slot[2]
+            self.expirations += 1
+
+    def enforce_limits(self, keep: str = None):
+        while self.users and (len(self.users) > self.max_users or self.size_bytes > self.max_bytes):
+            user_id, slot = next(iter(self.users.items()))
+            if user_id == keep:
+                break
+            self.users.popitem(last=False)
+            self.size_bytes -= slot[2]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.users),
+            "bytes": self.size_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -0,0 +1,63 @@
+import asyncio
+import platform
+import socket
+import time
+
+import aiohttp
+
+from utils.pool import run_blocking
+from utils.sampler import get_local_ip
+
+PUBLIC_IP_URL = "https://api.ipify.org"
+
+class HostFacts:
+    # stuff that barely changes, looked up once and the ips refreshed on a long ttl
+    def __init__(self, public_ip_url: str = PUBLIC_IP_URL, ttl: float = 21600, retry: float = 300, timeout: float = 5, pool=None):
+        uname = platform.uname()
+        self.os = f"{uname.system} {uname.release}"
+        self.hostname = socket.gethostname()
+        self.public_ip_url = public_ip_url
+        self.ttl = ttl
+        self.retry = retry # offline? try again sooner than the full ttl
+        self.timeout = timeout
+        self.pool = pool
+        self.local_ip = "N/A"
+        self.public_ip = "N/A"
+        self.next_refresh = 0.0
+        self.lookups = 0
+        self.lock = asyncio.Lock()
+
+    async def fetch_public_ip(self) -> str:
+        self.lookups += 1
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(self.public_ip_url) as response:
+                response.raise_for_status()
+                return (await response.text()).strip()
+
+    async def refresh(self):
+        try:
+            self.local_ip = await run_blocking(self.pool, get_local_ip, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            pass # stuck route lookup, keep the last one
+        if not self.public_ip_url:
+            self.next_refresh = time.monotonic() + self.ttl
+            return
+        try:
+            self.public_ip = await self.fetch_public_ip()
+            self.next_refresh = time.monotonic() + self.ttl
+        except Exception:
+            # keep whatever we knew last, "N/A" if we never got one
+            self.next_refresh = time.monotonic() + self.retry
+
+    async def get(self) -> dict:
+        if time.monotonic() >= self.next_refresh:
+            async with self.lock:
+                if time.monotonic() >= self.next_refresh:
+                    await self.refresh()
+        return {
+            "os": self.os,
+            "hostname": self.hostname,
+            "local_ip": self.local_ip,
+            "public_ip": self.public_ip
+        }
@@ -0,0 +1,38 @@
+from utils.timeseries import TimeSeriesStore
+
+TREND_METRICS = ("cpu", "memory", "load", "net", "power")
+
+class HostStats:
+    # latest snapshot, trends and session totals for one machine (this one or an agent)
+    def __init__(self, name: str, facts: dict = None):
+        self.name = name
+        self.facts = facts or {}
+        self.latest = None
+        self.trends = TimeSeriesStore(TREND_METRICS)
+        self.session = {"power_wh": 0.0, "bytes": 0}
+        self.last_net_sample = None # (time, bytes sent + recv)
+
+    def record(self, stats: dict) -> tuple:
+        # returns (power_wh, bytes) added since the previous sample
+        self.latest = stats
+        net = stats["net"]
+        net_total = net.bytes_sent + net.bytes_recv
+        last_time, last_total = self.last_net_sample or (stats["time"], net_total)
+        self.last_net_sample = (stats["time"], net_total)
+
+        # only what happened since the previous sample gets added, never the whole session again
+        elapsed = max(0.0, stats["time"] - last_time)
+        net_delta = max(0, net_total - last_total) # nic counters can reset
+        net_rate = net_delta / elapsed if elapsed else 0.0
+        power_wh = stats["power"] * elapsed / 3600
+
+        self.session["power_wh"] += power_wh
+        self.session["bytes"] += net_delta
+        self.trends.append(stats["time"], {
+            "cpu": stats["cpu_percent"],
+            "memory": stats["memory"].percent,
+            "load": stats["load"][0],
+            "net": net_rate,
+            "power": stats["power"]
+        })
+        return power_wh, net_delta
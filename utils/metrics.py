@@ -0,0 +1,162 @@
+import time
+from collections import defaultdict
+
+from aiohttp import web
+
+from utils.agentproto import parse_address
+
+SUB_BUCKETS = 16 # per power of two, so any recorded value is within ~6% of the real one
+MAX_BUCKET = SUB_BUCKETS * 34 # up to ~2^38 us, way past any timeout we use
+PROM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def bucket_index(micros: int) -> int:
+    # hdr style log-linear buckets, exact below 16us then 16 linear steps per doubling
+    if micros < SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - 5
+    return min(MAX_BUCKET - 1, SUB_BUCKETS + shift * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS)
+
+def bucket_high(index: int) -> int:
+    if index < SUB_BUCKETS:
+        return index
+    shift, step = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+    return ((SUB_BUCKETS + step + 1) << shift) - 1
+
+class Histogram:
+    __slots__ = ("counts", "count", "errors", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * MAX_BUCKET
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, error: bool = False):
+        seconds = max(0.0, seconds) # a negative value would index from the top end or past it
+        self.counts[bucket_index(int(seconds * 1_000_000))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = max(1, round(q * self.count))
+        seen = 0
+        for index, hits in enumerate(self.counts):
+            seen += hits
+            if seen >= target:
+                return min(self.max, bucket_high(index) / 1_000_000)
+        return self.max
+
+    def cumulative(self, bounds) -> list:
+        # counts at or under each bound, for prometheus' le buckets
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = bound * 1_000_000
+            while index < MAX_BUCKET and bucket_high(index) <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+class Timer:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+class Metrics:
+    # latency histograms, error counts and plain event counters keyed by name like "slash.ping" or "chat.upstream"
+    def __init__(self):
+        self.histograms = defaultdict(Histogram)
+        self.events = defaultdict(int)
+        self.gauges = {} # name -> callable read at export time, e.g. queue depths
+        self.started = time.monotonic()
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        self.histograms[name].record(seconds, error)
+
+    def timer(self, name: str) -> Timer:
+        return Timer(self, name)
+
+    def incr(self, name: str, amount: int = 1):
+        self.events[name] += amount
+
+    def gauge(self, name: str, read):
+        self.gauges[name] = read
+
+    def read_gauges(self) -> dict:
+        values = {}
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                continue
+        return values
+
+    def summary_lines(self) -> list:
+        minutes = max(1 / 60, (time.monotonic() - self.started) / 60)
+        lines = [f"{'name':22s} {'count':>7s} {'/min':>6s} {'err%':>5s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}"]
+        for name, hist in sorted(self.histograms.items()):
+            lines.append(
+                f"{name[:22]:22s} {hist.count:7d} {hist.count / minutes:6.1f} {hist.errors * 100 / hist.count:5.1f}"
+                + "".join(f" {value * 1000:6.0f}ms" for value in (hist.quantile(0.5), hist.quantile(0.9), hist.quantile(0.99), hist.max))
+            )
+        lines += [f"{name[:22]:22s} {count:7d} {count / minutes:6.1f}" for name, count in sorted(self.events.items())]
+        lines += [f"{name[:22]:22s} {value:7g} now" for name, value in sorted(self.read_gauges().items())]
+        return lines
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP kyra_latency_seconds time spent per command or stage",
+            "# TYPE kyra_latency_seconds histogram"
+        ]
+        for name, hist in sorted(self.histograms.items()):
+            for bound, seen in zip(PROM_BUCKETS, hist.cumulative(PROM_BUCKETS)):
+                lines.append(f'kyra_latency_seconds_bucket{{name="{name}",le="{bound}"}} {seen}')
+            lines.append(f'kyra_latency_seconds_bucket{{name="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'kyra_latency_seconds_sum{{name="{name}"}} {hist.total:.6f}')
+            lines.append(f'kyra_latency_seconds_count{{name="{name}"}} {hist.count}')
+        lines += ["# HELP kyra_latency_quantile_seconds hdr histogram quantiles since start", "# TYPE kyra_latency_quantile_seconds gauge"]
+        for name, hist in sorted(self.histograms.items()):
+            for q in (0.5, 0.9, 0.99):
+                lines.append(f'kyra_latency_quantile_seconds{{name="{name}",quantile="{q}"}} {hist.quantile(q):.6f}')
+        lines += ["# HELP kyra_errors_total failed commands or stages", "# TYPE kyra_errors_total counter"]
+        lines += [f'kyra_errors_total{{name="{name}"}} {hist.errors}' for name, hist in sorted(self.histograms.items())]
+        lines += ["# HELP kyra_events_total plain event counters", "# TYPE kyra_events_total counter"]
+        lines += [f'kyra_events_total{{name="{name}"}} {count}' for name, count in sorted(self.events.items())]
+        lines += ["# HELP kyra_gauge current values like queue depths", "# TYPE kyra_gauge gauge"]
+        lines += [f'kyra_gauge{{name="{name}"}} {value}' for name, value in sorted(self.read_gauges().items())]
+        return "\n".join(lines) + "\n"
+
+    async def start_server(self, address: str) -> web.AppRunner:
+        # GET /metrics in prometheus text format, meant for localhost or a unix socket
+        async def handle(request):
+            return web.Response(text=self.prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        kind, where = parse_address(address)
+        site = web.UnixSite(runner, where) if kind == "unix" else web.TCPSite(runner, *where)
+        await site.start()
+        return runner
+
+metrics = Metrics() # shared by bot.py and the cmd modules, survives cmd reloads
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.metrics import metrics
+
+def timed_call(func, args):
+    # runs in the worker, monotonic is system wide so the start time means the same thing in a child process
+    return time.monotonic(), func(*args)
+
+async def run_blocking(pool: "WorkerPool", func, *args, timeout: float = None):
+    # utils that also run outside the bot (agent.py, benchmarks) take an optional pool, without one it's a plain thread
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    return await pool.run(func, *args, timeout=timeout)
+
+class WorkerPool:
+    # the one place blocking work goes, bounded so a flood of calls queues up here instead of piling threads on
+    def __init__(self, threads: int = 8, processes: int = 0, max_pending: int = 64, timeout: float = 30.0):
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="kyra-worker")
+        self.max_processes = processes or os.cpu_count() or 1
+        self.processes = None # made on first run_cpu, most setups never pay for it
+        self.slots = asyncio.Semaphore(max_pending)
+        self.timeout = timeout
+        self.in_flight = 0 # waiting for a slot, queued in the executor or running
+        metrics.gauge("pool.in_flight", lambda: self.in_flight)
+
+    async def run(self, func, *args, timeout: float = None):
+        return await self.submit(self.threads, "thread", func, args, timeout)
+
+    async def run_cpu(self, func, *args, timeout: float = None):
+        # func and args have to pickle, use it for real cpu work (hashing, compression, parsing big blobs)
+        if self.processes is None:
+            self.processes = ProcessPoolExecutor(max_workers=self.max_processes)
+        return await self.submit(self.processes, "process", func, args, timeout)
+
+    async def submit(self, executor, kind: str, func, args: tuple, timeout: float = None):
+        queued = time.monotonic()
+        self.in_flight += 1
+        try:
+            async with self.slots:
+                future = asyncio.get_running_loop().run_in_executor(executor, timed_call, func, args)
+                try:
+                    started, result = await asyncio.wait_for(future, timeout or self.timeout)
+                except asyncio.TimeoutError:
+                    # a thread can't be killed, it keeps its worker until func returns, we just stop waiting
+                    metrics.incr(f"pool.{kind}.timeout")
+                    metrics.observe(f"pool.{kind}.run", time.monotonic() - queued, error=True)
+                    raise
+                except Exception:
+                    metrics.observe(f"pool.{kind}.run", time.monotonic() - queued, error=True)
+                    raise
+        finally:
+            self.in_flight -= 1
+        metrics.observe(f"pool.{kind}.wait", max(0.0, started - queued))
+        metrics.observe(f"pool.{kind}.run", time.monotonic() - started)
+        return result
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes:
+            self.processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+
+SCOPES = ("user", "channel", "guild")
+
+def parse_limit(value: str) -> tuple:
+    # "6/3" = 6 per minute with bursts of up to 3, "0" or empty = no limit
+    if not value or value.strip() in ("0", "off"):
+        return 0.0, 0
+    per_minute, _, burst = value.partition("/")
+    per_minute = float(per_minute)
+    return per_minute, int(burst) if burst else max(1, int(per_minute))
+
+class MentionLimiter:
+    # token buckets per user, channel and guild, a mention has to fit in all of them and only then is charged
+    def __init__(self, limits: dict, sweep_interval: float = 60.0):
+        self.limits = {} # scope -> (tokens per sec, burst)
+        self.buckets = {scope: OrderedDict() for scope in SCOPES} # key -> [tokens, last update], oldest touched first
+        self.warned = OrderedDict() # (scope, key) that said no -> time its cooldown reply stops being repeated
+        self.sweep_interval = sweep_interval
+        self.next_sweep = 0.0 # set on the first check
+        self.counters = {"allowed": 0, "limited": 0, "warned": 0, "expired": 0}
+        for scope, (per_minute, burst) in limits.items():
+            self.configure(scope, per_minute, burst)
+
+    def configure(self, scope: str, per_minute: float, burst: int):
+        if per_minute <= 0 or burst <= 0:
+            self.limits.pop(scope, None)
+        else:
+            self.limits[scope] = (per_minute / 60, burst)
+        self.buckets[scope].clear() # everyone starts over with a full bucket under the new limit
+
+    def describe(self, scope: str) -> str:
+        if scope not in self.limits:
+            return "off"
+        rate, burst = self.limits[scope]
+        return f"{rate * 60:g}/min, burst {burst}"
+
+    def refill(self, scope: str, key, now: float) -> list:
+        rate, burst = self.limits[scope]
+        buckets = self.buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [float(burst), now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            buckets.move_to_end(key)
+        return bucket
+
+    def check(self, user, channel, guild, now: float = None) -> tuple:
+        # -> (allowed, secs until it would be, scope that said no, whether to tell the user)
+        now = time.monotonic() if now is None else now
+        if now >= self.next_sweep:
+            self.sweep(now)
+        keys = {"user": user, "channel": channel, "guild": guild}
+        charged = []
+        retry_after = 0.0
+        blocked_by = None
+        for scope in self.limits:
+            if keys[scope] is None:
+                continue # no guild in DMs
+            bucket = self.refill(scope, keys[scope], now)
+            charged.append(bucket)
+            if bucket[0] < 1:
+                wait = (1 - bucket[0]) / self.limits[scope][0]
+                if wait > retry_after:
+                    retry_after, blocked_by = wait, scope
+        if blocked_by is None:
+            for bucket in charged:
+                bucket[0] -= 1
+            self.counters["allowed"] += 1
+            return True, 0.0, None, False
+        self.counters["limited"] += 1
+        # one cooldown reply per bucket per cooldown, a busy channel gets one, not one per throttled user
+        blocked = (blocked_by, keys[blocked_by])
+        warn = self.warned.get(blocked, 0.0) <= now
+        if warn:
+            self.warned[blocked] = now + retry_after
+            self.warned.move_to_end(blocked)
+            self.counters["warned"] += 1
+        return False, retry_after, blocked_by, warn
+
+    def sweep(self, now: float):
+        # a bucket idle long enough to be full again is the same as no bucket, drop those from the old end
+        self.next_sweep = now + self.sweep_interval
+        for scope, (rate, burst) in self.limits.items():
+            buckets = self.buckets[scope]
+            idle_after = burst / rate
+            while buckets:
+                key, (tokens, updated) = next(iter(buckets.items()))
+                if now - updated < idle_after:
+                    break
+                del buckets[key]
+                self.counters["expired"] += 1
+        for scope in SCOPES:
+            if scope not in self.limits:
+                self.buckets[scope].clear()
+        while self.warned and next(iter(self.warned.values())) <= now:
+            self.warned.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            **{f"{scope}_buckets": len(self.buckets[scope]) for scope in SCOPES},
+            **self.counters
+        }
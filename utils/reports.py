@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import discord
+
+from utils.metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parked_reports (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    error TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def rejected(error: Exception) -> bool:
+    # discord refused the message itself (too long, bad embed...), sending it again won't change that
+    # 403/404 are about the DM channel and 429 about timing, those are worth a retry
+    return isinstance(error, discord.HTTPException) and 400 <= error.status < 500 and error.status not in (403, 404, 429)
+
+class ReportQueue:
+    # reports land in sqlite first, a background task DMs them to the admin, bursts go out as one digest
+    def __init__(self, bot: discord.Client, path: str, admin_id: int, render, coalesce: float = 2.0,
+                 batch_size: int = 10, base_backoff: float = 5.0, max_backoff: float = 600.0):
+        self.bot = bot
+        self.path = path
+        self.admin_id = admin_id
+        self.render = render # (list of report dicts) -> [(Embed, how many reports it covers)], swapped on cmd reload
+        self.coalesce = coalesce
+        self.batch_size = batch_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.conn = None
+        self.channel = None # admin's DM channel, its id is kept in the db so a restart doesn't fetch it again
+        self.pending = 0
+        self.wake = None
+        self.task = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-store")
+        self.counters = {"queued": 0, "sent": 0, "messages": 0, "failed": 0, "parked": 0}
+        metrics.gauge("report.pending", lambda: self.pending)
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def start(self):
+        self.pending = await self.run(self._open)
+        self.wake = asyncio.Event()
+        self.task = asyncio.create_task(self.dispatch_loop())
+        if self.pending:
+            self.wake.set() # leftovers from before the restart
+
+    def _open(self) -> int:
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        return self.conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    async def submit(self, report: dict):
+        # one local insert, no REST calls, so the reporter gets their ack right after this
+        now = time.time()
+        await self.run(self._insert, json.dumps(report), now)
+        self.pending += 1
+        self.counters["queued"] += 1
+        self.wake.set()
+
+    def _insert(self, payload: str, now: float):
+        with self.conn:
+            self.conn.execute("INSERT INTO reports (payload, created, next_try) VALUES (?, ?, ?)", (payload, now, now))
+
+    def _due(self, now: float) -> tuple:
+        rows = self.conn.execute(
+            "SELECT id, payload, created, attempts FROM reports WHERE next_try <= ? ORDER BY id LIMIT ?",
+            (now, self.batch_size)
+        ).fetchall()
+        upcoming = self.conn.execute("SELECT MIN(next_try) FROM reports WHERE next_try > ?", (now,)).fetchone()[0]
+        return rows, upcoming
+
+    def _delete(self, ids: list):
+        with self.conn:
+            self.conn.executemany("DELETE FROM reports WHERE id = ?", [(i,) for i in ids])
+
+    def _retry_later(self, ids: list, next_try: float):
+        with self.conn:
+            self.conn.executemany("UPDATE reports SET attempts = attempts + 1, next_try = ? WHERE id = ?", [(next_try, i) for i in ids])
+
+    def _park(self, row: tuple, error: str):
+        # kept out of the queue but not thrown away, the admin can still dig it out of the db
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO parked_reports VALUES (?, ?, ?, ?)", (row[0], row[1], row[2], error))
+            self.conn.execute("DELETE FROM reports WHERE id = ?", (row[0],))
+
+    def _get_meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value):
+        with self.conn:
+            if value is None:
+                self.conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    async def admin_channel(self) -> discord.abc.Messageable:
+        if self.channel is None:
+            channel_id = await self.run(self._get_meta, f"dm_channel:{self.admin_id}")
+            if channel_id:
+                self.channel = self.bot.get_partial_messageable(int(channel_id), type=discord.ChannelType.private)
+            else:
+                admin = self.bot.get_user(self.admin_id) or await self.bot.fetch_user(self.admin_id)
+                self.channel = admin.dm_channel or await admin.create_dm()
+                await self.run(self._set_meta, f"dm_channel:{self.admin_id}", self.channel.id)
+        return self.channel
+
+    async def dispatch_loop(self):
+        while True:
+            try:
+                await self.wake.wait()
+                self.wake.clear()
+                await asyncio.sleep(self.coalesce) # let the rest of a burst pile up behind the first one
+                delay = await self.dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # a db hiccup mustn't end delivery for good, the reports are still on disk
+                logging.exception("report dispatch failed, trying again in %.1fs", self.base_backoff)
+                delay = self.base_backoff
+            if delay is not None and not self.wake.is_set():
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=max(0.0, delay - self.coalesce))
+                except asyncio.TimeoutError:
+                    self.wake.set()
+
+    async def dispatch(self):
+        # sends everything that's due, returns secs until the next retry is due (None if nothing is waiting)
+        while True:
+            now = time.time()
+            rows, upcoming = await self.run(self._due, now)
+            if not rows:
+                return None if upcoming is None else upcoming - now
+            try:
+                channel = await self.admin_channel()
+            except Exception as e:
+                await self.retry_later(rows, now, e)
+                continue
+            position = 0
+            for embed, count in self.render([json.loads(row[1]) for row in rows]):
+                chunk = rows[position:position + count]
+                position += count
+                if not await self.deliver(channel, embed, chunk):
+                    await self.retry_later(rows[position:], now) # discord is having a moment, the rest waits with it
+                    break
+
+    async def deliver(self, channel: discord.abc.Messageable, embed: discord.Embed, rows: list) -> bool:
+        # False only when it's worth waiting and trying again, a rejected report is dealt with here
+        try:
+            await channel.send(embed=embed)
+        except Exception as e:
+            if not rejected(e):
+                await self.retry_later(rows, time.time(), e)
+                return False
+            if len(rows) > 1:
+                # find the one(s) discord won't take, the others go through on their own
+                for i, row in enumerate(rows):
+                    embed, _ = self.render([json.loads(row[1])])[0]
+                    if not await self.deliver(channel, embed, [row]):
+                        await self.retry_later(rows[i + 1:], time.time())
+                        return False
+                return True
+            await self.run(self._park, rows[0], str(e))
+            self.pending -= 1
+            self.counters["parked"] += 1
+            metrics.incr("report.parked")
+            logging.error("report %s rejected by discord and parked in %s - %s", rows[0][0], self.path, e,
+                          extra={"fields": {"kind": "report_parked", "report_id": rows[0][0], "status": e.status}})
+            return True
+        await self.run(self._delete, [row[0] for row in rows])
+        self.pending -= len(rows)
+        self.counters["sent"] += len(rows)
+        self.counters["messages"] += 1
+        for row in rows:
+            metrics.observe("report.delivery", time.time() - row[2])
+        return True
+
+    async def retry_later(self, rows: list, now: float, error: Exception = None):
+        if not rows:
+            return
+        if isinstance(error, (discord.NotFound, discord.Forbidden)):
+            self.channel = None # stale or closed DM, look it up fresh next time
+            await self.run(self._set_meta, f"dm_channel:{self.admin_id}", None)
+        attempts = max(row[3] for row in rows)
+        delay = min(self.max_backoff, self.base_backoff * 2 ** attempts)
+        await self.run(self._retry_later, [row[0] for row in rows], now + delay)
+        if error is not None:
+            self.counters["failed"] += 1
+            metrics.incr("report.failed")
+            print(f"couldn't deliver {len(rows)} report(s), retrying in {delay:.1f}s - {error}")
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.conn is not None:
+            await self.run(self.conn.close)
+            self.conn = None
+        self.executor.shutdown(wait=False)
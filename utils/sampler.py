@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import socket
+import time
+
+from utils.lazy import lazy_import
+from utils.pool import run_blocking
+
+psutil = lazy_import("psutil")
+
+def system_uptime() -> datetime.timedelta:
+    try:
+        with open('/proc/uptime', 'r') as f: # fetch uptime this is for ubuntu
+            uptime_seconds = float(f.readline().split()[0])
+        return datetime.timedelta(seconds=uptime_seconds)
+    except:
+        return datetime.datetime.now() - datetime.datetime.fromtimestamp(psutil.boot_time())
+
+def estimate_power(cpu_percent: float) -> float:
+    # rough watts guess from load, frequency and io activity
+    try:
+        memory = psutil.virtual_memory()
+
+        cpu_freq = psutil.cpu_freq()
+        current_freq = cpu_freq.current if cpu_freq else 2000
+        cpu_count = psutil.cpu_count(logical=True)
+
+        base_power = 5
+        cpu_power = (cpu_percent / 100) * (current_freq / 1000) * 0.5 * cpu_count
+        memory_power = (memory.percent / 100) * 2
+
+        io_power = 0
+        try:
+            disk_io = psutil.disk_io_counters()
+            net_io = psutil.net_io_counters()
+            if disk_io and disk_io.read_bytes + disk_io.write_bytes > 0:
+                io_power += 2
+            if net_io and net_io.bytes_sent + net_io.bytes_recv > 0:
+                io_power += 0.5
+        except:
+            pass
+
+        return max(base_power + cpu_power + memory_power + io_power, 1)
+    except Exception as e:
+        print(f"Error calculating power: {e}")
+        return 1
+
+def get_local_ip() -> str:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(('1.1.1.1', 80))
+        ip = s.getsockname()[0]
+    except Exception:
+        ip = 'N/A'
+    finally:
+        s.close()
+    return ip
+
+def busy_percent(before, after) -> float:
+    # same math as psutil.cpu_percent, guest time is already counted in user
+    total = sum(after) - sum(before)
+    for field in ("guest", "guest_nice"):
+        total -= getattr(after, field, 0.0) - getattr(before, field, 0.0)
+    idle = (after.idle - before.idle) + (getattr(after, "iowait", 0.0) - getattr(before, "iowait", 0.0))
+    if total <= 0:
+        return 0.0
+    return round(min(100.0, max(0.0, (total - idle) / total * 100)), 1)
+
+FIRST_WINDOW = 1.0 # secs the first cpu reading covers, psutil reports 0% for a window of ~0s
+
+class SystemSampler:
+    # samples in the background off the loop, readers only ever touch self.latest
+    def __init__(self, interval: float = 5.0, pool=None):
+        self.interval = interval
+        self.pool = pool # a hung psutil call times out there instead of holding a thread forever
+        self.latest = None
+        self.task = None
+        self.listeners = [] # called with every new snapshot
+        self.ready = asyncio.Event() # set once the first snapshot is in
+        # our own baseline, psutil keeps cpu_percent's per thread and samples run on whichever pool worker is free
+        self.cpu_times = psutil.cpu_times(percpu=True)
+        self.primed = time.monotonic()
+
+    def sample(self) -> dict:
+        # total and per-core both come from the same window since the last call
+        cpu_times = psutil.cpu_times(percpu=True)
+        per_core = [busy_percent(before, after) for before, after in zip(self.cpu_times, cpu_times)]
+        self.cpu_times = cpu_times
+        cpu_percent = sum(per_core) / len(per_core) if per_core else 0.0
+        load1, load5, load15 = psutil.getloadavg()
+        return {
+            "time": time.time(),
+            "cpu_percent": cpu_percent,
+            "per_core": per_core,
+            "load": (load1, load5, load15),
+            "memory": psutil.virtual_memory(),
+            "disk": psutil.disk_usage('/'),
+            "net": psutil.net_io_counters(),
+            "power": estimate_power(cpu_percent),
+            "uptime": system_uptime()
+        }
+
+    async def refresh(self) -> dict:
+        if self.latest is None:
+            # sampling right after the prime would read every core as idle
+            await asyncio.sleep(self.primed + min(self.interval, FIRST_WINDOW) - time.monotonic())
+        self.latest = await run_blocking(self.pool, self.sample)
+        self.ready.set()
+        for listener in self.listeners:
+            listener(self.latest)
+        return self.latest
+
+    async def first_snapshot(self, timeout: float = 30) -> dict:
+        # for readers that show up before the run task's first sample, a second refresh would cut its window short
+        if self.latest is None:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        return self.latest
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error sampling system stats: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if not self.task or self.task.done():
+            self.task = (loop or asyncio.get_running_loop()).create_task(self.run())
+        return self.task
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,162 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, defaultdict, deque
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float = None):
+        super().__init__(f"rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class SchedulerBusy(Exception):
+    pass
+
+class Job:
+    __slots__ = ("user", "key", "guild", "func", "future", "queued_at")
+
+    def __init__(self, user, key, guild, func, future):
+        self.user = user
+        self.key = key
+        self.guild = guild
+        self.func = func
+        self.future = future
+        self.queued_at = time.monotonic()
+
+class RequestScheduler:
+    # caps in-flight llm calls globally and per guild, hands out slots round robin per user
+    def __init__(self, max_concurrent: int = 4, per_guild: int = 2, per_user_queue: int = 3, max_wait: float = 60.0,
+                 max_retries: int = 3, base_backoff: float = 1.0, max_backoff: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.per_guild = per_guild
+        self.per_user_queue = per_user_queue
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.queues = OrderedDict() # user -> deque of jobs, order is the round robin
+        self.in_flight = 0
+        self.guild_in_flight = defaultdict(int)
+        self.running = {} # (user, key) -> job already talking to upstream
+        self.paused_until = 0.0
+        self.resume_handle = None
+        self.waits = deque(maxlen=1000)
+        self.counters = defaultdict(int)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    async def submit(self, user, guild, key, func):
+        # same user asking the same thing while it's still pending just shares that job
+        running = self.running.get((user, key))
+        if running:
+            self.counters["merged"] += 1
+            return await asyncio.shield(running.future)
+        queue = self.queues.get(user)
+        if queue:
+            for job in queue:
+                if job.key == key:
+                    self.counters["merged"] += 1
+                    return await asyncio.shield(job.future)
+            if len(queue) >= self.per_user_queue:
+                stale = queue.popleft()
+                self.counters["dropped"] += 1
+                stale.future.set_exception(SchedulerBusy("replaced by a newer request"))
+        job = Job(user, key, guild, func, asyncio.get_running_loop().create_future())
+        self.queues.setdefault(user, deque()).append(job)
+        self.counters["submitted"] += 1
+        self.dispatch()
+        return await asyncio.shield(job.future)
+
+    def dispatch(self):
+        loop = asyncio.get_running_loop()
+        if loop.time() < self.paused_until:
+            return
+        now = time.monotonic()
+        blocked = 0
+        while self.queues and self.in_flight < self.max_concurrent and blocked < len(self.queues):
+            user, queue = next(iter(self.queues.items()))
+            job = queue[0]
+            if now - job.queued_at > self.max_wait:
+                queue.popleft()
+                self.counters["dropped"] += 1
+                job.future.set_exception(SchedulerBusy("waited too long in queue"))
+            elif job.guild is not None and self.guild_in_flight.get(job.guild, 0) >= self.per_guild:
+                self.queues.move_to_end(user)
+                blocked += 1
+                continue
+            else:
+                queue.popleft()
+                self.start(job, now)
+            blocked = 0
+            if queue:
+                self.queues.move_to_end(user)
+            else:
+                del self.queues[user]
+
+    def start(self, job: Job, now: float):
+        self.in_flight += 1
+        if job.guild is not None: # DMs only count against the global cap, one shared "None guild" would serialize them all
+            self.guild_in_flight[job.guild] += 1
+        self.waits.append(now - job.queued_at)
+        self.running[(job.user, job.key)] = job
+        asyncio.create_task(self.run(job))
+
+    async def run(self, job: Job):
+        try:
+            result = await job.func()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.running.pop((job.user, job.key), None)
+            self.in_flight -= 1
+            if job.guild is not None:
+                self.guild_in_flight[job.guild] -= 1
+                if not self.guild_in_flight[job.guild]:
+                    del self.guild_in_flight[job.guild]
+            self.counters["completed"] += 1
+            self.dispatch()
+
+    async def retry(self, func, *args):
+        # retries RateLimited with jittered exponential backoff, never sooner than Retry-After
+        attempt = 0
+        while True:
+            try:
+                return await func(*args)
+            except RateLimited as e:
+                self.counters["rate_limited"] += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.base_backoff * 2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+                if e.retry_after:
+                    delay = max(delay, e.retry_after)
+                self.pause(delay)
+                attempt += 1
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    def pause(self, delay: float):
+        # upstream told us to slow down, so hold new work until it's ready again
+        loop = asyncio.get_running_loop()
+        until = loop.time() + delay
+        if until <= self.paused_until:
+            return
+        self.paused_until = until
+        if self.resume_handle:
+            self.resume_handle.cancel()
+        self.resume_handle = loop.call_at(until, self.dispatch)
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            **self.counters
+        }
@@ -0,0 +1,170 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_user ON history (user_id, id);
+CREATE TABLE IF NOT EXISTS disabled_channels (
+    channel_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class ChatStore:
+    # sqlite backed chat memory, writes are queued and flushed in batches off the loop
+    def __init__(self, path: str, keep: int = 5, flush_interval: float = 2.0, batch_size: int = 200):
+        self.path = path
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = []
+        self.conn = None
+        self.flush_task = None
+        self.wake = None
+        # one thread so every db call runs in submit order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-store")
+        self.writes = 0
+        self.flushes = 0
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self) -> set:
+        await self.run(self._open)
+        self.wake = asyncio.Event()
+        self.flush_task = asyncio.create_task(self.flush_loop())
+        return await self.run(self._load_channels)
+
+    def _open(self):
+        # timeout = how long to wait on another shard process holding the write lock
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _load_channels(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT channel_id FROM disabled_channels")}
+
+    async def load_settings(self) -> dict:
+        return await self.run(self._load_settings)
+
+    def _load_settings(self) -> dict:
+        return dict(self.conn.execute("SELECT key, value FROM settings"))
+
+    def queue(self, op: tuple):
+        self.pending.append(op)
+        if self.wake and len(self.pending) >= self.batch_size:
+            self.wake.set()
+
+    def add_message(self, user_id: str, entry: dict):
+        self.queue(("msg", user_id, entry["role"], entry["content"], time.time()))
+
+    def clear_user(self, user_id: str):
+        self.queue(("clear", user_id))
+
+    def set_channel_disabled(self, channel_id: int, disabled: bool):
+        self.queue(("channel", channel_id, disabled))
+
+    def set_setting(self, key: str, value: str):
+        self.queue(("setting", key, value))
+
+    async def load_history(self, user_id: str) -> tuple:
+        # -> (entries, time of the newest one or None), anything still queued counts too, it just hasn't hit the disk yet
+        queued = [op for op in self.pending if op[1] == user_id and op[0] in ("msg", "clear")]
+        rows = await self.run(self._load_history, user_id)
+        entries = [{"role": role, "content": content} for role, content, _ in rows]
+        last = rows[-1][2] if rows else None
+        for op in queued:
+            if op[0] == "clear":
+                entries, last = [], None
+            else:
+                entries.append({"role": op[2], "content": op[3]})
+                last = op[4]
+        return entries[-self.keep:], last
+
+    def _load_history(self, user_id: str) -> list:
+        rows = self.conn.execute(
+            "SELECT role, content, created FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, self.keep)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    async def flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"chat store flush failed, error - {e}")
+
+    async def flush(self):
+        if not self.pending or self.conn is None:
+            return
+        ops, self.pending = self.pending, []
+        try:
+            await self.run(self._write, ops)
+        except Exception:
+            self.pending[:0] = ops # keep them for the next try
+            raise
+        self.writes += len(ops)
+        self.flushes += 1
+
+    def _write(self, ops: list):
+        touched = set()
+        with self.conn:
+            for op in ops:
+                kind = op[0]
+                if kind == "msg":
+                    self.conn.execute(
+                        "INSERT INTO history (user_id, role, content, created) VALUES (?, ?, ?, ?)",
+                        op[1:]
+                    )
+                    touched.add(op[1])
+                elif kind == "clear":
+                    self.conn.execute("DELETE FROM history WHERE user_id = ?", (op[1],))
+                    touched.discard(op[1])
+                elif kind == "channel":
+                    if op[2]:
+                        self.conn.execute("INSERT OR IGNORE INTO disabled_channels VALUES (?)", (op[1],))
+                    else:
+                        self.conn.execute("DELETE FROM disabled_channels WHERE channel_id = ?", (op[1],))
+                elif kind == "setting":
+                    self.conn.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", op[1:])
+            # only the last `keep` rows per user are ever read back
+            for user_id in touched:
+                self.conn.execute(
+                    "DELETE FROM history WHERE user_id = ? AND id NOT IN "
+                    "(SELECT id FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                    (user_id, user_id, self.keep)
+                )
+
+    async def close(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+            self.flush_task = None
+        await self.flush()
+        if self.conn is not None:
+            await self.run(self.conn.close)
+            self.conn = None
+        self.executor.shutdown(wait=False)
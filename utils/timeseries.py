@@ -0,0 +1,106 @@
+import math
+from array import array
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# name -> (bucket size in secs, buckets kept)
+DEFAULT_TIERS = {
+    "raw": (30, 240),      # 2h of raw samples
+    "1m": (60, 1440),      # 1 day
+    "1h": (3600, 720),     # 30 days
+    "1d": (86400, 365)     # 1 year
+}
+
+class Tier:
+    # fixed size ring of buckets, each slot remembers which bucket it holds so stale ones read as empty
+    def __init__(self, step: int, capacity: int, metrics: tuple):
+        self.step = step
+        self.capacity = capacity
+        self.buckets = array('q', [-1]) * capacity
+        self.counts = array('l', [0]) * capacity
+        self.sums = {m: array('d', [0.0]) * capacity for m in metrics}
+        self.peaks = {m: array('d', [0.0]) * capacity for m in metrics}
+
+    def add(self, ts: float, values: dict):
+        bucket = int(ts // self.step)
+        slot = bucket % self.capacity
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            self.counts[slot] = 0
+            for m in self.sums:
+                self.sums[m][slot] = 0.0
+                self.peaks[m][slot] = -math.inf
+        self.counts[slot] += 1
+        for m, value in values.items():
+            self.sums[m][slot] += value
+            if value > self.peaks[m][slot]:
+                self.peaks[m][slot] = value
+
+    def averages(self, metric: str, end: float, points: int) -> list:
+        # newest last, None where nothing was recorded
+        last = int(end // self.step)
+        sums = self.sums[metric]
+        result = []
+        for bucket in range(last - min(points, self.capacity) + 1, last + 1):
+            slot = bucket % self.capacity
+            if self.buckets[slot] == bucket and self.counts[slot]:
+                result.append(sums[slot] / self.counts[slot])
+            else:
+                result.append(None)
+        return result
+
+    def maxes(self, metric: str, end: float, points: int) -> list:
+        # highest single sample per bucket, same layout as averages
+        last = int(end // self.step)
+        peaks = self.peaks[metric]
+        result = []
+        for bucket in range(last - min(points, self.capacity) + 1, last + 1):
+            slot = bucket % self.capacity
+            if self.buckets[slot] == bucket and peaks[slot] != -math.inf:
+                result.append(peaks[slot])
+            else:
+                result.append(None)
+        return result
+
+class TimeSeriesStore:
+    # appends go to every tier at once, so rollups never need a rescan of raw data
+    def __init__(self, metrics: tuple, tiers: dict = None):
+        self.metrics = metrics
+        self.tiers = {name: Tier(step, capacity, metrics) for name, (step, capacity) in (tiers or DEFAULT_TIERS).items()}
+        self.last_ts = None
+
+    def append(self, ts: float, values: dict):
+        for tier in self.tiers.values():
+            tier.add(ts, values)
+        self.last_ts = ts
+
+    def query(self, metric: str, tier: str, points: int, end: float = None) -> list:
+        if end is None:
+            end = self.last_ts or 0
+        return self.tiers[tier].averages(metric, end, points)
+
+    def summary(self, metric: str, tier: str, points: int, end: float = None) -> dict:
+        if end is None:
+            end = self.last_ts or 0
+        values = [v for v in self.query(metric, tier, points, end) if v is not None]
+        if not values:
+            return {"avg": 0.0, "min": 0.0, "max": 0.0}
+        # max is the real peak, a 1h bucket averaging 40% can hide a minute at 100%
+        peaks = [v for v in self.tiers[tier].maxes(metric, end, points) if v is not None]
+        return {"avg": sum(values) / len(values), "min": min(values), "max": max(peaks, default=max(values))}
+
+def sparkline(values: list, low: float = None, high: float = None) -> str:
+    known = [v for v in values if v is not None]
+    if not known:
+        return ""
+    low = min(known) if low is None else low
+    high = max(known) if high is None else high
+    span = (high - low) or 1
+    out = []
+    for v in values:
+        if v is None:
+            out.append(" ")
+        else:
+            index = int((min(max(v, low), high) - low) / span * (len(SPARK_CHARS) - 1))
+            out.append(SPARK_CHARS[index])
+    return "".join(out)
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from utils.metrics import metrics
+
+class LoopWatchdog:
+    # a side thread that notices when the loop stops ticking and logs the stack it's stuck in
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.beat = time.monotonic()
+        self.loop_thread = None
+        self.task = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.blocks = 0
+
+    async def heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.beat = now
+            metrics.observe("loop.lag", max(0.0, now - expected))
+
+    def watch(self):
+        reported = False
+        while not self.stopped.wait(self.interval):
+            stalled = time.monotonic() - self.beat
+            if stalled < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True # once per stall, the stack shows the culprit already
+            self.blocks += 1
+            metrics.incr("loop.blocked")
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-12:]) if frame else "(no frame)"
+            if frame and frame.f_code.co_name in ("select", "poll"):
+                stack += "(idle in select, so it's waiting on the gil, look for cpu heavy python in worker threads)\n"
+            logging.warning("event loop blocked for %.0fms, currently in:\n%s", stalled * 1000, stack,
+                            extra={"fields": {"kind": "loop_blocked", "stalled_ms": round(stalled * 1000, 1)}})
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        # has to be called from the loop's own thread
+        loop = loop or asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self.task = loop.create_task(self.heartbeat())
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task:
+            self.task.cancel()
+            self.task = None